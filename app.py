@@ -1,15 +1,14 @@
 import streamlit as st
-from parser.whatsapp_parser import preprocess_whatsapp
-from parser.telegram_parser import preprocess_telegram_html
-from parser.facebook_parser import preprocess_facebook
-from utils import analysis
+from parser import sniff
+from utils import aggregates, analysis, cache, corpus, incremental, jobs, report, sentiment, topics
+
+# matplotlib, seaborn and plotly are imported inside the menu branches that draw with them, and
+# sklearn, TextBlob and WordCloud inside the analysis functions, so a cold start stays fast
 
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import re
 import random
+import time
+import zipfile
 
 st.set_page_config(page_title="Conversight 💬", page_icon="💬", layout="wide")
 st.markdown('<style>' + open('style.css').read() + '</style>', unsafe_allow_html=True)
@@ -25,7 +24,7 @@ Whether you're the group ghost 👻 or the non-stop talker 🎤, let's decode th
 
 st.markdown("### 🎯 Get Started in 4 Quirky Steps")
 st.markdown("""
-1️⃣ **Export** your chat from WhatsApp (TXT), Telegram, or Facebook (HTML).  
+1️⃣ **Export** your chat from WhatsApp (TXT), Telegram, or Facebook (HTML or JSON).  
 2️⃣ **Pick your platform** from the sidebar 🧭  
 3️⃣ **Upload your chat file** — don't worry, we won’t judge 😄  
 4️⃣ **Explore** secrets, moods, trends, and even emoji obsessions! 🤩
@@ -41,43 +40,160 @@ Kya pata kaun sabse zyada active nikle ya kaun ghost bana baitha hai! 👻
 """)
 
 st.sidebar.header("📂 Upload Your Chat File")
-uploaded_file = st.sidebar.file_uploader("Drop it like it's hot 🔥 (.txt or .html)", type=["txt", "html"])
+uploaded_file = st.sidebar.file_uploader("Drop it like it's hot 🔥 (.txt, .html, .json or .zip)", type=["txt", "html", "json", "zip"])
 platform = st.sidebar.radio("Choose Your Chat Realm 🌍", ["WhatsApp", "Telegram", "Facebook"])
 
 st.set_option('deprecation.showPyplotGlobalUse', False)
 
-@st.cache_data(show_spinner=False, persist="disk")
+WRONG_FILE_WARNINGS = {
+    "whatsapp": "⚠️ Hmm, this doesn't look like a WhatsApp TXT file. Did you export without media?",
+    "telegram": "⚠️ Are you sure this is a Telegram file? We're not convinced 😅",
+    "facebook": "⚠️ That doesn’t scream 'Facebook chat export'. Try another `.html` file from your archive.",
+}
+
+def parse_upload(uploaded_file, content, platform):
+    # Zipped exports are streamed member by member; plain files are parsed from the upload's buffer
+    if zipfile.is_zipfile(uploaded_file):
+        if sniff.zip_platform(uploaded_file) != platform.lower():
+            st.warning(WRONG_FILE_WARNINGS[platform.lower()])
+            return None
+        return sniff.parse_zip(uploaded_file, platform)
+    if not sniff.looks_like(sniff.sample_text(content), platform):
+        st.warning(WRONG_FILE_WARNINGS[platform.lower()])
+        return None
+    return sniff.parse_bytes(content, platform)
+
+def upload_token(uploaded_file, platform):
+    # Identifies an upload across reruns (Streamlit 1.16 calls the id "id", newer releases "file_id")
+    upload_id = getattr(uploaded_file, 'file_id', None) or getattr(uploaded_file, 'id', None)
+    return (upload_id, uploaded_file.name, uploaded_file.size, platform)
+
+def load_session_data(uploaded_file, platform):
+    # Every widget change reruns the script; the loaded chat is kept in the session so a rerun does
+    # not hash the upload and read the frame back from the cache again. Only the latest chat is kept.
+    token = upload_token(uploaded_file, platform)
+    loaded = st.session_state.get('loaded_chat')
+    if loaded is None or loaded['token'] != token:
+        df, chat_key = load_data(uploaded_file, platform)
+        loaded = {'token': token, 'df': df, 'chat_key': chat_key}
+        st.session_state['loaded_chat'] = loaded if df is not None else None
+    return loaded['df'], loaded['chat_key']
+
 def load_data(uploaded_file, platform):
+    # Parsed chats are cached on disk by content hash, so re-opening a file skips parsing entirely
     try:
-        content = uploaded_file.read()
-
-        if platform.lower() == "whatsapp":
-            text = content.decode("utf-8")
-            if not text.startswith("[") and not re.match(r"\d{1,2}/\d{1,2}/\d{2,4}", text):
-                st.warning("⚠️ Hmm, this doesn't look like a WhatsApp TXT file. Did you export without media?")
-                return None
-            return preprocess_whatsapp(text)
-
-        elif platform.lower() == "telegram":
-            html = content.decode("utf-8")
-            if "<div class=\"message default clearfix\"" not in html:
-                st.warning("⚠️ Are you sure this is a Telegram file? We're not convinced 😅")
-                return None
-            return preprocess_telegram_html(html)
-
-        elif platform.lower() == "facebook":
-            html = content.decode("utf-8")
-            if "_a6-g" not in html or "_a6-h" not in html:
-                st.warning("⚠️ That doesn’t scream 'Facebook chat export'. Try another `.html` file from your archive.")
-                return None
-            return preprocess_facebook(html)
-
-        return None
+        # A view of the upload's bytes: no copy, and no decoded copy of the whole file either
+        content = uploaded_file.getbuffer()
+        key = cache.cache_key(cache.content_hash(content), platform)
+
+        df = cache.load_frame(key)
+        if df is None and platform.lower() == "whatsapp" and not zipfile.is_zipfile(uploaded_file):
+            # A re-export of a cached chat only needs its new messages parsed
+            df = incremental.ingest_appended(content, key)
+        if df is None:
+            df = parse_upload(uploaded_file, content, platform)
+            if df is not None and not df.empty:
+                cache.store_frame(key, df)
+                incremental.record_ingest(key, content, aggregates.build_aggregates(df, platform))
+        return df, key
 
     except Exception as e:
         st.error(f"💥 Something broke while processing the file! Error: {e}")
+        return None, None
+
+def load_aggregates(df, chat_key, platform):
+    # The per-user cube saved next to the parsed chat; rebuilt in memory if the cache could not be written
+    chat_aggs = aggregates.load_aggregates(chat_key) if chat_key else None
+    return chat_aggs if chat_aggs is not None else aggregates.build_aggregates(df, platform)
+
+def load_topic_model(chat_df, chat_key, platform):
+    # One LDA model per chat, fitted on everyone's messages and saved next to the parsed chat
+    try:
+        full_corpus = corpus.chat_corpus(chat_df, chat_key, 'Overall Users', platform)
+        return topics.chat_topic_model(chat_key, full_corpus) if full_corpus is not None else None
+    except Exception as e:
+        print(f"Error loading topic model: {e}")
         return None
 
+# -------------------------------
+# Background Analyses
+# -------------------------------
+# Slow analyses run on the job pool (utils.jobs) and call progress(fraction, message, **partial_results);
+# each finished result is kept per (chat, user, analysis), so coming back to a page is instant
+def sentiment_job(chat_df, chat_key, progress):
+    progress(0.1, "Scoring messages...")
+    return sentiment.chat_sentiment(chat_df, chat_key)
+
+def nlp_job(df, chat_df, chat_key, selected_user, platform, progress):
+    progress(0.1, "Tokenizing messages...")
+    chat_corpus = corpus.chat_corpus(df, chat_key, selected_user, platform)
+    top_words = analysis.perform_tfidf_analysis(df['message'], platform, chat_corpus=chat_corpus)
+    progress(0.3, "Finding topics...", top_words=top_words)
+    topic_model = load_topic_model(chat_df, chat_key, platform)
+    # A single user's messages are ranked against the chat's topics
+    topic_list = analysis.perform_lda_analysis(df['message'], 5, platform, model=topic_model,
+                                               chat_corpus=chat_corpus if selected_user != 'Overall Users' else None)
+    return {'top_words': top_words, 'topics': topic_list,
+            'stats': topic_model['stats'] if topic_model is not None else None}
+
+def wordcloud_job(chat_df, chat_key, selected_user, platform, progress):
+    progress(0.2, "Counting words...")
+    # Rendered from the chat's per-user token counts; the PNG is cached per chat and user
+    full_corpus = corpus.chat_corpus(chat_df, chat_key, 'Overall Users', platform)
+    progress(0.6, "Painting the cloud...")
+    return analysis.create_wordcloud(selected_user, chat_df, platform, chat_corpus=full_corpus, chat_key=chat_key)
+
+def csv_job(df, chat_key, selected_user, progress):
+    progress(0.1, "Writing the CSV...")
+    return report.chat_csv(selected_user, df, chat_key)
+
+def report_job(df, chat_df, chat_key, selected_user, platform, chat_aggs, progress):
+    # Built once per chat and user, then served from the cache
+    report_data = report.load_report(chat_key, selected_user)
+    if report_data is not None:
+        return report_data
+    progress(0.1, "Preparing the report...")
+    chat_corpus = corpus.chat_corpus(df, chat_key, selected_user, platform)
+    topic_model = load_topic_model(chat_df, chat_key, platform)
+    progress(0.5, "Writing the workbook...")
+    return report.chat_report(selected_user, df, platform, chat_aggs, chat_corpus, topic_model, chat_key)
+
+# Set on the rerun poll_jobs() asks for, so that rerun shows a failure instead of retrying it
+polling_rerun = st.session_state.pop('polling_rerun', False)
+
+def run_job(chat_key, user, name, fn, *args, on_partial=None):
+    # Submits (or rejoins) the job and returns its result once it is done. While it runs, its progress
+    # and partial results (to on_partial) are drawn and None is returned: the script carries on and
+    # poll_jobs() reruns it shortly, so the page never waits on the job.
+    job = jobs.submit(chat_key, user, name, fn, *args, retry_failed=not polling_rerun)
+    status = jobs.status(job)
+    if status['state'] == 'done':
+        return jobs.result(job)
+    if status['state'] == 'failed':
+        st.error(f"💥 {name} failed: {status['error']}")
+        return None
+
+    st.progress(status['progress'])
+    st.caption(f"{status['message']} ({status['seconds']:.0f}s)")
+    if on_partial is not None:
+        on_partial(status['partial'])
+    st.session_state['jobs_pending'] = True
+    return None
+
+def poll_jobs():
+    # Called once the page is drawn: while a job shown on it runs, rerun after a short pause
+    if st.session_state.pop('jobs_pending', False):
+        time.sleep(jobs.POLL_SECONDS)
+        st.session_state['polling_rerun'] = True
+        st.experimental_rerun()
+
+def analysis_started(chat_key):
+    # The button is only True on the run its click causes. The flag keeps the analysis on screen
+    # while widgets inside it (the zoom slider, ...) rerun the script; a new chat starts over.
+    if st.sidebar.button("Start Analysis 🚀"):
+        st.session_state['analysis_started'] = chat_key
+    return st.session_state.get('analysis_started', False) == chat_key
+
 fun_facts = [
     "💡 You blink 4x less while texting.",
     "📈 The average person sends 72 messages a day.",
@@ -90,9 +206,10 @@ fun_fact = random.choice(fun_facts)
 st.info(f"🤔 Fun Fact: {fun_fact}")
 
 if uploaded_file:
-    df = load_data(uploaded_file, platform)
+    df, chat_key = load_session_data(uploaded_file, platform)
 
     if df is not None and not df.empty:
+        chat_aggs = load_aggregates(df, chat_key, platform)
         user_list = df['username'].dropna().unique().tolist()
         user_list.sort()
         user_list.insert(0, "Overall Users")
@@ -136,7 +253,8 @@ if uploaded_file:
             else:
                 st.warning("Please pick at least two warriors 👥")
 
-        elif st.sidebar.button("Start Analysis 🚀"):
+        elif analysis_started(chat_key):
+            chat_df = df
             if selected_user != 'Overall Users':
                 df = df[df['username'] == selected_user]
 
@@ -148,14 +266,19 @@ if uploaded_file:
                 st.markdown(f"📏 Avg Words per Message: **{df['total_word'].mean():.2f}**")
 
                 # STREAK FEATURE
-                streak = analysis.longest_streak(df, selected_user if selected_user != "Overall Users" else None)
-                st.markdown(f"🔥 **Longest Chat Streak:** {streak} day(s)")
+                streak = analysis.streak_stats(df, selected_user, aggs=chat_aggs)
+                if streak is not None:
+                    st.markdown(f"🔥 **Longest Chat Streak:** {streak['longest_streak']} day(s)")
+                    st.markdown(f"⚡ **Current Streak:** {streak['current_streak']} day(s)")
+                    if streak['longest_silence'] > 0:
+                        st.markdown(f"🦗 **Longest Silence:** {streak['longest_silence']} day(s), "
+                                    f"{streak['silence_start']:%d %b %Y} – {streak['silence_end']:%d %b %Y}")
 
                 # THROWBACK FEATURE
                 date, user, msg = analysis.throwback_message(df)
                 st.markdown(f"🕰️ **First Message Ever:** *{msg}* by **{user}** on **{date}**")
 
-                stats = analysis.fetch_stats(selected_user, df, platform)
+                stats = analysis.fetch_stats(selected_user, df, platform, aggs=chat_aggs)
                 
                 persona = analysis.personality_summary(stats)
                 st.markdown(f"🧬 **Personality Match:** {persona}")
@@ -163,28 +286,22 @@ if uploaded_file:
                 comment = analysis.fun_summary_comment(stats)
                 st.markdown(f"💬 **Conversight Says:** {comment}")
 
-                st.download_button("📥 Grab CSV", df.to_csv(index=False), "chat_analysis.csv")
+                # Written once per chat and user, a slice at a time, then served from the cache
+                csv_data = run_job(chat_key, selected_user, "CSV export", csv_job, df, chat_key, selected_user)
+                if csv_data is not None:
+                    st.download_button("📥 Grab CSV", csv_data, "chat_analysis.csv", mime="text/csv")
 
-                with pd.ExcelWriter("chat_analysis_full.xlsx") as writer:
-                    df.to_excel(writer, sheet_name="Messages", index=False)
+                report_data = run_job(chat_key, selected_user, "Excel report", report_job,
+                                      df, chat_df, chat_key, selected_user, platform, chat_aggs)
+                if report_data is not None:
+                    st.download_button("📥 Download Full Report (Excel)", report_data, "chat_analysis_full.xlsx",
+                                       mime=report.XLSX_MIME)
 
-                    emoji_df = analysis.emoji_helper(selected_user, df)
-                    emoji_df.to_excel(writer, sheet_name="Emoji Summary", index=False)
-
-                    tfidf_words = analysis.perform_tfidf_analysis(df["message"], platform)
-                    pd.DataFrame(tfidf_words, columns=["Word", "TF-IDF Score"]).to_excel(writer, sheet_name="TF-IDF", index=False)
-
-                    lda_topics = analysis.perform_lda_analysis(df["message"], 5, platform)
-                    pd.DataFrame(lda_topics, columns=["LDA Topics"]).to_excel(writer, sheet_name="Topics", index=False)
-
-                with open("chat_analysis_full.xlsx", "rb") as f:
-                    st.download_button("📥 Download Full Report (Excel)", f, "chat_analysis_full.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-                
                 # Fun random reaction for this section
                 st.warning(analysis.get_section_reaction("✨ Quick Chat Recap"))
 
             elif choice == "🏆 Who Talks Most?":
-                stats = analysis.fetch_stats(selected_user, df, platform)
+                stats = analysis.fetch_stats(selected_user, df, platform, aggs=chat_aggs)
                 titles = ["Messages 📩", "Words 📝", "Media 📷", "Links 🔗", "Emojis 😀", "Deleted 🗑️", "Edited ✍️", "Contacts 📞", "Locations 📍"]
                 for title, value in zip(titles, stats):
                     st.markdown(f"### Total {title}:")
@@ -193,58 +310,85 @@ if uploaded_file:
                 st.warning(analysis.get_section_reaction("🏆 Who Talks Most?"))
 
             elif choice == "🎭 Mood Swings (Sentiment)":
-                df['Sentiment'] = df['message'].apply(analysis.extract_sentiment)
-                st.subheader("Mood Map 📊")
-                fig = px.bar(df['Sentiment'].value_counts(), labels={'index': 'Sentiment', 'value': 'Count'})
-                st.plotly_chart(fig)
-
-                st.subheader("Mood Over Time 🧠")
-                sentiment_over_time = df.groupby(['date', 'Sentiment']).size().reset_index(name='Counts')
-                fig, ax = plt.subplots(figsize=(12, 8))
-                sns.lineplot(data=sentiment_over_time, x='date', y='Counts', hue='Sentiment', ax=ax)
-                st.pyplot(fig)
+                import matplotlib.pyplot as plt
+                import plotly.express as px
+                import seaborn as sns
+
+                # Scored once per chat and cached; a single user's view is a slice of it
+                labels = run_job(chat_key, None, "Sentiment", sentiment_job, chat_df, chat_key)
+                if labels is not None:
+                    df = df.assign(Sentiment=labels)
+                    st.subheader("Mood Map 📊")
+                    fig = px.bar(df['Sentiment'].value_counts(), labels={'index': 'Sentiment', 'value': 'Count'})
+                    st.plotly_chart(fig)
+
+                    st.subheader("Mood Over Time 🧠")
+                    # Binned to at most a few hundred points per label, however long the chat is
+                    sentiment_over_time = analysis.sentiment_over_time(df)
+                    fig, ax = plt.subplots(figsize=(12, 8))
+                    sns.lineplot(data=sentiment_over_time, x='date', y='Counts', hue='Sentiment', ax=ax)
+                    st.pyplot(fig)
 
-                vibe_summary = analysis.check_mood_vibe(df)
-                st.success(f"🧠 Vibe Check: {vibe_summary}")
+                    vibe_summary = analysis.check_mood_vibe(df)
+                    st.success(f"🧠 Vibe Check: {vibe_summary}")
 
                 st.warning(analysis.get_section_reaction("🎭 Mood Swings (Sentiment)"))
 
             elif choice == "🧠 Deep Talk Dive (NLP)":
                 st.subheader("🧠 TF-IDF Keywords")
-                top_words = analysis.perform_tfidf_analysis(df['message'], platform)
-                st.write(top_words)
-
+                keywords = st.empty()
                 st.subheader("💡 Topic Clusters (LDA)")
-                topics = analysis.perform_lda_analysis(df['message'], 5, platform)
-                for topic in topics:
-                    st.write(topic)
+                # Keywords show up as soon as they are ready, while the topic model is still fitting
+                def show_keywords(partial):
+                    if 'top_words' in partial:
+                        keywords.write(partial['top_words'])
+
+                nlp = run_job(chat_key, selected_user, "NLP", nlp_job, df, chat_df, chat_key, selected_user, platform,
+                              on_partial=show_keywords)
+                if nlp is not None:
+                    keywords.write(nlp['top_words'])
+                    for topic in nlp['topics']:
+                        st.write(topic)
+                    if nlp['stats'] is not None:
+                        st.caption(topics.format_stats(nlp['stats']))
 
                 st.warning(analysis.get_section_reaction("🧠 Deep Talk Dive (NLP)"))
 
             elif choice == "📅 Daily Habits Uncovered":
+                import matplotlib.pyplot as plt
+                import seaborn as sns
+
                 if selected_user == 'Overall Users':
-                    top, bottom = analysis.most_least_busy_users(df)
+                    top, bottom = analysis.most_least_busy_users(df, aggs=chat_aggs)
                     st.subheader("🔥 Most Active Users")
                     st.bar_chart(top)
                     st.subheader("🧊 Least Active Users")
                     st.bar_chart(bottom)
                 else:
                     st.subheader("🕓 Activity Over Time")
-                    activity = analysis.user_activity_over_time(selected_user, df)
+                    first, last = df['date'].min().date(), df['date'].max().date()
+                    if first < last:
+                        start, end = st.slider("Zoom", min_value=first, max_value=last, value=(first, last))
+                    else:
+                        start, end = first, last
+                    # Hourly when zoomed in, coarser bins for longer ranges
+                    activity = analysis.user_activity_over_time(selected_user, df, aggs=chat_aggs, chat_key=chat_key,
+                                                                start=pd.Timestamp(start),
+                                                                end=pd.Timestamp(end) + pd.Timedelta(hours=23))
                     st.line_chart(activity)
 
                 st.subheader("📅 Weekday Vibes")
-                week = analysis.week_activity_map(selected_user, df)
+                week = analysis.week_activity_map(selected_user, df, aggs=chat_aggs)
                 week.sort_index().plot(kind="bar")
                 st.pyplot(plt.gcf())
 
                 st.subheader("📆 Monthly Mojo")
-                month = analysis.month_activity_map(selected_user, df)
+                month = analysis.month_activity_map(selected_user, df, aggs=chat_aggs)
                 month.sort_index().plot(kind="bar")
                 st.pyplot(plt.gcf())
 
                 st.subheader("🔥 Emoji Burnmap")
-                heatmap = analysis.activity_heatmap(selected_user, df)
+                heatmap = analysis.activity_heatmap(selected_user, df, aggs=chat_aggs)
                 fig, ax = plt.subplots(figsize=(12, 8))
                 sns.heatmap(heatmap, cmap='coolwarm', annot=True, fmt=".0f", ax=ax)
                 st.pyplot(fig)
@@ -252,12 +396,15 @@ if uploaded_file:
                 st.warning(analysis.get_section_reaction("📅 Daily Habits Uncovered"))
 
             elif choice == "🔠 Words & Emojis Showdown":
+                import matplotlib.pyplot as plt
+
                 st.subheader("📚 Most Common Words")
-                wc_array = analysis.create_wordcloud(selected_user, df, platform)
-                st.image(wc_array)
+                wc_array = run_job(chat_key, selected_user, "Word cloud", wordcloud_job, chat_df, chat_key, selected_user, platform)
+                if wc_array is not None:
+                    st.image(wc_array)
 
                 st.subheader("😆 Top Emojis Used")
-                emoji_df = analysis.emoji_helper(selected_user, df)
+                emoji_df = analysis.emoji_helper(selected_user, df, aggs=chat_aggs)
                 col1, col2, col3 = st.columns([1, 2, 1])
                 with col2:
                     st.dataframe(emoji_df.head(5))
@@ -282,4 +429,6 @@ if was_helpful != "Please choose":
         st.sidebar.success("You're awesome! Thanks for the feedback 💌")
 
 st.sidebar.markdown("---")
-st.sidebar.markdown("🧠 Built with 💻 by Supriya · © 2025 Conversight")
\ No newline at end of file
+st.sidebar.markdown("🧠 Built with 💻 by Supriya · © 2025 Conversight")
+
+poll_jobs()
\ No newline at end of file
@@ -0,0 +1,53 @@
+"""Speed of the shared emoji matcher against per-message emoji calls.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_emojis --rows 1000000
+"""
+import argparse
+import time
+from collections import Counter
+
+import emoji
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_features import make_messages
+from utils.emojis import count_emojis, emoji_frequencies, emoji_pattern
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def legacy_frequencies(messages):
+    # What emoji_helper did before: one code point at a time, so sequences are split apart
+    all_possible_emojis = set(emoji.EMOJI_DATA.keys())
+    found = []
+    for message in messages:
+        found.extend([ch for ch in str(message) if ch in all_possible_emojis])
+    return Counter(found)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    messages = pd.Series(make_messages(args.rows))
+    _, build_t = timed(emoji_pattern)
+
+    legacy_counts, legacy_count_t = timed(lambda: messages.apply(emoji.emoji_count).to_numpy())
+    fast_counts, fast_count_t = timed(lambda: count_emojis(messages))
+    _, legacy_freq_t = timed(lambda: legacy_frequencies(messages))
+    _, fast_freq_t = timed(lambda: emoji_frequencies(messages))
+
+    print(f"messages:                    {len(messages)}")
+    print(f"matcher build (once):        {build_t:.3f}s")
+    print(f"emoji_count per row:         {legacy_count_t:.3f}s")
+    print(f"count_emojis:                {fast_count_t:.3f}s  ({legacy_count_t / fast_count_t:.1f}x)")
+    print(f"emoji_helper per character:  {legacy_freq_t:.3f}s")
+    print(f"emoji_frequencies:           {fast_freq_t:.3f}s  ({legacy_freq_t / fast_freq_t:.1f}x)")
+    print(f"counts identical to emoji.emoji_count: {np.array_equal(legacy_counts, fast_counts)}")
+
+if __name__ == "__main__":
+    main()
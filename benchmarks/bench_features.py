@@ -0,0 +1,124 @@
+"""Compare the per-row derived columns the parsers used to build with utils.features.
+
+URL and emoji counts were the slowest of these: URLExtract and emoji.emoji_count ran once per row.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_features --rows 1000000
+    python -m benchmarks.bench_features --rows 100000   # quicker: legacy URLExtract takes minutes on 1M
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils import features
+from utils.emojis import count_emojis
+from utils.urls import count_urls
+
+SHORT_REPLIES = ["ok", "haha 😂", "<Media omitted>", "hmm", "👍🏽", "This message was deleted"]
+VOCABULARY = ("kya haal hai bro great job movie kal milte hain check https://example.com "
+              "www.google.com dekho yaar 😀 🔥 pizza party tonight office late").split()
+
+def make_messages(rows, seed=0, short_share=0.35):
+    # A mix of repeated short replies and mostly distinct longer messages, like a real group chat
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(3, 13, rows)
+    words = rng.choice(VOCABULARY, lengths.sum())
+    bounds = np.cumsum(lengths)[:-1]
+    messages = np.array([" ".join(chunk) for chunk in np.split(words, bounds)], dtype=object)
+    short = rng.random(rows) < short_share
+    messages[short] = rng.choice(SHORT_REPLIES, short.sum())
+    return messages
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2020-01-01").value
+    end = pd.Timestamp("2024-01-01").value
+    return pd.DataFrame({
+        "date": pd.to_datetime(rng.integers(start, end, rows)),
+        "message": make_messages(rows, seed),
+    })
+
+# Per-row implementations the parsers used before utils.features existed
+def legacy_time(df):
+    df["month"] = df["date"].dt.month_name()
+    df["day"] = df["date"].dt.day_name()
+    df["hour"] = df["date"].dt.hour
+
+def legacy_words(df):
+    df["total_word"] = df["message"].apply(lambda x: len(x.split()))
+
+def legacy_urls(df):
+    from urlextract import URLExtract
+
+    extractor = URLExtract()
+    df["url_count"] = df["message"].apply(lambda x: len(extractor.find_urls(x)))
+
+def legacy_emojis(df):
+    import emoji
+
+    df["emoji_count"] = df["message"].apply(emoji.emoji_count)
+
+def legacy_period(df):
+    df["period"] = df["hour"].apply(lambda x: 'Night' if 0 <= x < 6 else (
+        'Morning' if 6 <= x < 12 else ('Afternoon' if 12 <= x < 18 else 'Evening')))
+
+def fast_time(df):
+    dates = df["date"]
+    df["month"] = features._categorical_from_codes(dates.dt.month, features.MONTHS)
+    df["day"] = features._categorical_from_codes(dates.dt.dayofweek + 1, features.DAYS)
+    df["hour"] = dates.dt.hour
+
+def fast_words(df):
+    df["total_word"] = features.count_words(df["message"])
+
+def pandas_words(df):
+    # The pandas string-method spelling, kept for comparison with count_words
+    df["total_word"] = df["message"].str.split().str.len()
+
+def fast_urls(df):
+    df["url_count"] = count_urls(df["message"])
+
+def fast_emojis(df):
+    df["emoji_count"] = count_emojis(df["message"])
+
+def fast_period(df):
+    features.add_period(df)
+
+def timed(fn, df):
+    start = time.perf_counter()
+    fn(df)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    base = make_frame(args.rows)
+    legacy_df, fast_df = base.copy(), base.copy()
+
+    print(f"{'column':<12}{'legacy (s)':>12}{'vectorized (s)':>16}{'speedup':>10}")
+    for name, legacy, fast in [("month/day", legacy_time, fast_time),
+                               ("total_word", legacy_words, fast_words),
+                               ("url_count", legacy_urls, fast_urls),
+                               ("emoji_count", legacy_emojis, fast_emojis),
+                               ("period", legacy_period, fast_period)]:
+        slow_t = timed(legacy, legacy_df)
+        fast_t = timed(fast, fast_df)
+        print(f"{name:<12}{slow_t:>12.3f}{fast_t:>16.3f}{slow_t / fast_t:>9.1f}x")
+
+    words_t = timed(pandas_words, base.copy())
+    print(f"\ntotal_word with str.split().str.len(): {words_t:.3f}s")
+
+    assert (legacy_df["total_word"] == fast_df["total_word"]).all()
+    assert (legacy_df["emoji_count"] == fast_df["emoji_count"]).all()
+    # The compiled URL pattern and URLExtract disagree on a few edge cases, never on these messages
+    assert (legacy_df["url_count"] == fast_df["url_count"]).all()
+    assert (legacy_df["period"] == fast_df["period"].astype(str)).all()
+    assert (legacy_df["day"] == fast_df["day"].astype(str)).all()
+
+if __name__ == "__main__":
+    main()
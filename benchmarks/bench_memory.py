@@ -0,0 +1,65 @@
+"""Memory of a parsed chat before and after the compact schema, column by column.
+
+"Before" is the schema parsers used to return: sender names and the "hh:mm AM/PM" time as
+Python strings, and int64 year/hour/minute/count columns.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_memory --rows 1000000
+    python -m benchmarks.bench_memory --rows 1000000 --arrow   # also Arrow-backed message text
+    python -m benchmarks.bench_memory --file chat.txt          # a real WhatsApp export
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.bench_features import make_frame
+from utils import features
+
+USERS = ["Priya Sharma", "Rahul", "Amit", "Neha", "Sneha Kapoor", "Vikram", "Ananya", "Rohan Mehta"]
+
+def synthetic_chat(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = make_frame(rows, seed)
+    df.insert(1, "username", rng.choice(USERS, rows).astype(object))
+    return features.enrich_messages(df)
+
+def legacy_frame(df):
+    legacy = df.copy()
+    legacy["username"] = legacy["username"].astype(object)
+    for column in ["year", "hour", "minute", "total_word", "url_count", "emoji_count"]:
+        legacy[column] = legacy[column].astype(np.int64)
+    legacy.insert(legacy.columns.get_loc("minute") + 1, "time", legacy["date"].dt.strftime("%I:%M %p"))
+    legacy["message"] = legacy["message"].astype(object)
+    return legacy
+
+def column_bytes(df):
+    return df.memory_usage(deep=True, index=False)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--file", help="WhatsApp export to measure instead of a synthetic chat")
+    parser.add_argument("--arrow", action="store_true", help="store message text as string[pyarrow]")
+    args = parser.parse_args()
+
+    if args.file:
+        from parser.whatsapp_parser import preprocess_whatsapp
+        with open(args.file, encoding="utf-8") as f:
+            compact = preprocess_whatsapp(f.read())
+    else:
+        compact = synthetic_chat(args.rows)
+    compact = features.compact_frame(compact, arrow_strings=args.arrow)
+    before, after = column_bytes(legacy_frame(compact)), column_bytes(compact)
+
+    mb = 1024 ** 2
+    print(f"{len(compact):,} messages")
+    print(f"{'column':<14}{'before (MB)':>13}{'after (MB)':>12}{'dtype':>22}")
+    for column in before.index:
+        dtype = str(compact[column].dtype) if column in compact else "(derived on demand)"
+        print(f"{column:<14}{before[column] / mb:>13.1f}{after.get(column, 0) / mb:>12.1f}{dtype[:20]:>22}")
+    print(f"{'total':<14}{before.sum() / mb:>13.1f}{after.sum() / mb:>12.1f}"
+          f"{f'{before.sum() / after.sum():.1f}x smaller':>22}")
+
+if __name__ == "__main__":
+    main()
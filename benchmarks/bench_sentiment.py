@@ -0,0 +1,84 @@
+"""Speed of the sentiment backends and how often the lexicon backend agrees with TextBlob.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_sentiment --rows 200000
+    python -m benchmarks.bench_sentiment --corpus messages.txt   # one message per line
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_features import make_messages
+from utils import sentiment
+
+MOOD_MESSAGES = [
+    "this is so good", "not good at all", "worst day ever", "I don't like it",
+    "very happy for you", "kya bakwas movie thi", "bahut badhiya yaar", "mast party tonight",
+    "I am not sad", "never boring with you guys", "terrible traffic again", "ok",
+    "haha 😂", "sounds great!", "that was really bad", "pizza was amazing but service was slow",
+]
+
+def make_corpus(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    messages = make_messages(rows, seed)
+    mood = rng.random(rows) < 0.3
+    messages[mood] = rng.choice(MOOD_MESSAGES, mood.sum())
+    return pd.Series(messages)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--corpus", help="text file with one message per line")
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            messages = pd.Series(f.read().splitlines())
+    else:
+        messages = make_corpus(args.rows)
+
+    uniques = pd.Series(messages.unique())
+    sentiment.lexicon_vectorizer()  # build the vocabulary outside the timed region
+
+    start = time.perf_counter()
+    lexicon = sentiment.lexicon_polarity(messages.tolist())
+    lexicon_t = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sentiment.polarity_scores(messages, backend="lexicon")
+    lexicon_dedup_t = time.perf_counter() - start
+
+    # TextBlob without the persistent memo, so the timing is a cold run
+    start = time.perf_counter()
+    exact = np.asarray(sentiment.compute_polarity(uniques.tolist()))
+    textblob_t = time.perf_counter() - start
+    exact = pd.Series(exact, index=uniques).reindex(messages).to_numpy()
+
+    lexicon_labels = sentiment.polarity_label(lexicon)
+    exact_labels = sentiment.polarity_label(exact)
+
+    print(f"messages:                  {len(messages)} ({len(uniques)} distinct)")
+    print(f"textblob (deduplicated):   {textblob_t:.3f}s")
+    print(f"lexicon (every row):       {lexicon_t:.3f}s  ({textblob_t / max(lexicon_t, 1e-9):.1f}x)")
+    print(f"lexicon (deduplicated):    {lexicon_dedup_t:.3f}s  ({textblob_t / max(lexicon_dedup_t, 1e-9):.1f}x)")
+    print(f"label agreement:           {(lexicon_labels == exact_labels).mean():.2%}")
+    print(f"polarity correlation:      {np.corrcoef(lexicon, exact)[0, 1]:.3f}")
+    print(f"mean absolute difference:  {np.abs(lexicon - exact).mean():.3f}")
+
+    print("\nLabels (rows: textblob, columns: lexicon):")
+    table = pd.crosstab(pd.Series(exact_labels, name="textblob"), pd.Series(lexicon_labels, name="lexicon"))
+    print(table.reindex(index=sentiment.LABELS, columns=sentiment.LABELS, fill_value=0).to_string())
+
+    if not args.corpus:
+        print("\nDisagreements on the built-in mood messages:")
+        for message in MOOD_MESSAGES:
+            lex = sentiment.lexicon_polarity([message])[0]
+            blob = sentiment.compute_polarity([message])[0]
+            if sentiment.polarity_label(lex) != sentiment.polarity_label(blob):
+                print(f"  lexicon={lex:+.2f} textblob={blob:+.2f}  {message!r}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Import cost of a cold app start, so heavy dependencies creeping back to the top level show up.
+
+Runs app.py's top-level imports in a fresh interpreter with -X importtime and reports the total,
+the most expensive packages, and which heavy libraries were loaded before any upload.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --budget 2.5   # exit 1 when a cold start gets slower
+"""
+import argparse
+import ast
+import importlib.util
+import subprocess
+import sys
+from collections import defaultdict
+
+# Libraries that only some menu branches need
+HEAVY = ["sklearn", "textblob", "wordcloud", "matplotlib", "seaborn", "plotly", "scipy", "urlextract"]
+
+def top_level_imports(path="app.py"):
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    statements = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            statements.append(ast.unparse(node))
+    return statements
+
+def installed(statement):
+    module = statement.split()[1].split(".")[0]
+    return importlib.util.find_spec(module) is not None
+
+def measure(statements):
+    # Returns (seconds, {top-level package: cumulative seconds}, heavy modules loaded)
+    code = "\n".join(statements + [f"import sys; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"])
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, check=True)
+    packages = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented under their parent and already counted in its cumulative time
+        if len(name) - len(name.lstrip()) == 1:
+            packages[name.strip().split(".")[0]] += int(cumulative) / 1e6
+    loaded = [m for m in result.stdout.strip().split(",") if m]
+    return sum(packages.values()), dict(packages), loaded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--app", default="app.py")
+    parser.add_argument("--top", type=int, default=8, help="packages to list")
+    parser.add_argument("--budget", type=float, help="fail when the cold start takes longer than this many seconds")
+    parser.add_argument("--eager", action="store_true", help="also time importing every heavy library up front")
+    args = parser.parse_args()
+
+    statements = top_level_imports(args.app)
+    missing = [s for s in statements if not installed(s)]
+    statements = [s for s in statements if installed(s)]
+
+    seconds, packages, loaded = measure(statements)
+    print(f"app.py top-level imports: {seconds:.3f}s")
+    for name, cost in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<20} {cost:.3f}s")
+    print(f"heavy libraries loaded at start: {', '.join(loaded) or 'none'}")
+    if missing:
+        print(f"not installed, left out: {'; '.join(missing)}")
+
+    if args.eager:
+        eager = [f"import {m}" for m in ["sklearn.decomposition", "sklearn.feature_extraction.text", "textblob",
+                                         "wordcloud", "matplotlib.pyplot", "seaborn", "plotly.express"]
+                 if installed(f"import {m}")]
+        eager_seconds, _, _ = measure(statements + eager)
+        print(f"with every heavy library up front: {eager_seconds:.3f}s (+{eager_seconds - seconds:.3f}s)")
+
+    if args.budget is not None and seconds > args.budget:
+        print(f"cold start {seconds:.3f}s is over the {args.budget:.3f}s budget")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
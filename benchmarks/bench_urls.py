@@ -0,0 +1,87 @@
+"""Accuracy and speed of the compiled URL counter against URLExtract.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_urls --rows 50000
+    python -m benchmarks.bench_urls --corpus messages.txt   # one message per line
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.urls import count_urls, url_pattern
+
+TRICKY_MESSAGES = [
+    "check https://example.com/path?q=1 now",
+    "www.google.com and maps.google.com",
+    "mail me at someone@gmail.com",
+    "the score was 1.5 to 2.0",
+    "open report.pdf or notes.txt",
+    "try foo.co.in/x?y=1#top",
+    "end of sentence.Next one",
+    "Visit Example.COM.",
+    "localhost:8000/admin",
+    "(see https://en.wikipedia.org/wiki/Chat_(software))",
+    "http://192.168.0.1/setup",
+    "bit.ly/3abcd and t.me/joinchat/xyz",
+    "no links here, just vibes 😀",
+    "ftp://files.example.org/pub",
+    "hi.there how.are you",
+]
+
+def make_corpus(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.Series(rng.choice(TRICKY_MESSAGES, rows))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--corpus", help="text file with one message per line")
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            messages = pd.Series(f.read().splitlines())
+    else:
+        messages = make_corpus(args.rows)
+
+    url_pattern()  # compile outside the timed region, like a warm app worker
+    start = time.perf_counter()
+    fast = count_urls(messages, "fast")
+    fast_t = time.perf_counter() - start
+
+    start = time.perf_counter()
+    exact = count_urls(messages, "exact")
+    exact_t = time.perf_counter() - start
+
+    # Per-row URLExtract, as every parser used to call it
+    from urlextract import URLExtract
+    extractor = URLExtract()
+    start = time.perf_counter()
+    messages.apply(lambda x: len(extractor.find_urls(x)))
+    legacy_t = time.perf_counter() - start
+
+    agree = (fast == exact).mean()
+    matched = np.minimum(fast, exact).sum()
+    precision = matched / max(fast.sum(), 1)
+    recall = matched / max(exact.sum(), 1)
+
+    print(f"messages:              {len(messages)}")
+    print(f"per-row URLExtract:    {legacy_t:.3f}s")
+    print(f"exact (deduplicated):  {exact_t:.3f}s")
+    print(f"fast (one pattern):    {fast_t:.3f}s  ({legacy_t / max(fast_t, 1e-9):.1f}x)")
+    print(f"per-message agreement: {agree:.2%}")
+    print(f"precision / recall:    {precision:.2%} / {recall:.2%}")
+
+    if not args.corpus:
+        print("\nDisagreements on the built-in corpus:")
+        for message in TRICKY_MESSAGES:
+            one = pd.Series([message])
+            f, e = count_urls(one, "fast")[0], count_urls(one, "exact")[0]
+            if f != e:
+                print(f"  fast={f} exact={e}  {message!r}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Throughput of WhatsApp format detection and timestamp parsing, one row per registered format.
+
+Each format gets a synthetic export of --rows messages. The table shows the time to detect the
+format, split lines into messages, and turn headers into timestamps with parse_headers, plus
+end-to-end messages per second. The old single-format path (pd.to_datetime with a fixed
+strptime format, Android day-first 12h only) is timed for comparison.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_whatsapp_formats --rows 200000
+    python -m benchmarks.bench_whatsapp_formats --rows 200000 --per-minute 5   # a busy chat
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_features import make_frame
+from parser import whatsapp_formats
+from parser.whatsapp_parser import iter_whatsapp_messages
+
+USERS = np.array(["Priya Sharma", "Rahul", "Amit", "Neha"], dtype=object)
+
+def _pad(values):
+    return values.astype(str).str.zfill(2)
+
+def render_headers(dates, name):
+    # The timestamp header each format writes in front of a message
+    layout, order, clock = name.split("-")
+    day, month = dates.dt.day.astype(str), dates.dt.month.astype(str)
+    first, second = (day, month) if order == "dmy" else (month, day)
+    if layout == "ios":
+        date = _pad(first) + "/" + _pad(second) + "/" + _pad(dates.dt.year % 100)
+    else:
+        date = first + "/" + second + "/" + dates.dt.year.astype(str)
+    if clock == "12h":
+        hour = ((dates.dt.hour + 11) % 12 + 1).astype(str)
+        suffix = np.where(dates.dt.hour < 12, " am", " pm")
+    else:
+        hour, suffix = _pad(dates.dt.hour), ""
+    time_text = hour + ":" + _pad(dates.dt.minute)
+    if layout == "ios":
+        return "[" + date + ", " + time_text + ":" + _pad(dates.dt.second) + suffix + "] "
+    return date + ", " + time_text + suffix + " - "
+
+def make_export(rows, name, seed=0, per_minute=1):
+    # per_minute > 1 packs messages into fewer distinct timestamps, like a busy group chat
+    df = make_frame(rows, seed)
+    if per_minute > 1:
+        stamps = df["date"].iloc[:max(rows // per_minute, 1)].to_numpy()
+        df["date"] = np.random.default_rng(seed).choice(stamps, rows)
+    df = df.sort_values("date", ignore_index=True)
+    df["date"] = df["date"].dt.floor("S" if name.startswith("ios") else "T")
+    users = np.random.default_rng(seed).choice(USERS, rows)
+    lines = render_headers(df["date"], name) + users + ": " + df["message"] + "\n"
+    return "".join(lines.tolist()), df["date"]
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+def legacy_parse(headers):
+    return pd.to_datetime(pd.Series(headers), format="%d/%m/%Y, %I:%M %p - ")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--per-minute", type=int, default=1, help="average messages sharing a timestamp")
+    args = parser.parse_args()
+
+    print(f"{'format':<18}{'detect (ms)':>12}{'split (s)':>11}{'parse (s)':>11}{'messages/s':>13}")
+    for name in whatsapp_formats.FORMATS:
+        text, expected = make_export(args.rows, name, per_minute=args.per_minute)
+        detect_t, detected = timed(whatsapp_formats.detect_format, text)
+        lines = text.splitlines(keepends=True)
+        split_t, messages = timed(lambda: list(iter_whatsapp_messages(lines, detected)))
+        headers = [header for header, _ in messages]
+        parse_t, dates = timed(whatsapp_formats.parse_headers, headers, detected)
+        total = detect_t + split_t + parse_t
+        print(f"{name:<18}{detect_t * 1000:>12.1f}{split_t:>11.3f}{parse_t:>11.3f}{len(headers) / total:>13,.0f}")
+
+        assert detected == name, f"{name} detected as {detected}"
+        assert (dates.to_numpy() == expected.to_numpy()).all()
+        if name == whatsapp_formats.DEFAULT_FORMAT:
+            legacy_t, legacy = timed(legacy_parse, headers)
+            assert (legacy.to_numpy() == expected.to_numpy()).all()
+            default_parse_t = parse_t
+
+    print(f"\nold fixed-format to_datetime ({whatsapp_formats.DEFAULT_FORMAT} only): {legacy_t:.3f}s "
+          f"vs parse_headers {default_parse_t:.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import pandas as pd
+
+from parser import sniff
+from parser.facebook_parser import THREAD_FILE_PATTERN, build_facebook_frame, parse_facebook_thread
+from parser.telegram_parser import list_telegram_pages, preprocess_telegram_export
+from utils import aggregates, cache, corpus, incremental, topics
+from utils.urls import URL_METHODS
+
+EXPORT_EXTENSIONS = ('.txt', '.html', '.json', '.zip')
+STAGES = ['parse', 'stats', 'emoji', 'tfidf', 'topics', 'write']
+
+# -------------------------------
+# Finding Exports
+# -------------------------------
+def _folder_kind(path):
+    # Multi-file exports are analysed as one chat: a Telegram export folder or a Facebook thread folder
+    names = os.listdir(path)
+    if any(THREAD_FILE_PATTERN.match(n) for n in names):
+        return 'facebook'
+    if list_telegram_pages(path):
+        return 'telegram'
+    return None
+
+def find_exports(paths):
+    # [(path, kind)] where kind is 'file', 'telegram' or 'facebook'
+    exports = []
+    for root in paths:
+        if os.path.isfile(root):
+            exports.append((root, 'file'))
+            continue
+        for folder, subfolders, files in os.walk(root):
+            kind = _folder_kind(folder)
+            if kind:
+                exports.append((folder, kind))
+                subfolders.clear()
+                continue
+            subfolders.sort()
+            exports.extend((os.path.join(folder, n), 'file') for n in sorted(files)
+                           if n.lower().endswith(EXPORT_EXTENSIONS))
+    return exports
+
+def report_name(path, roots):
+    # The export's path under the folder it was found in, extension included: chat.txt and chat.json
+    # next to each other are different chats
+    for root in roots:
+        # A path test, not a string prefix: /a/chats2 is not under /a/chats
+        root = os.path.abspath(root)
+        if os.path.isdir(root) and os.path.commonpath([os.path.abspath(path), root]) == root:
+            relative = os.path.relpath(path, root)
+            if relative != '.':
+                return relative.replace(os.sep, '__')
+    return os.path.basename(os.path.normpath(path))
+
+def unique_names(names):
+    # Exports found under different roots can still share a name; later ones get "-2", "-3", ...
+    seen, unique = set(), []
+    for name in names:
+        candidate, n = name, 1
+        while candidate in seen:
+            n += 1
+            candidate = f"{name}-{n}"
+        seen.add(candidate)
+        unique.append(candidate)
+    return unique
+
+# -------------------------------
+# Per-Chat Pipeline
+# -------------------------------
+@contextmanager
+def _stage(timings, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - start
+
+def load_export(path, kind, use_cache=True):
+    # Returns (platform, df, cache key); single files go through the same parse cache as the app
+    if kind == 'telegram':
+        return 'telegram', preprocess_telegram_export(path, max_workers=1), None
+    if kind == 'facebook':
+        _, usernames, messages, dates = parse_facebook_thread(path)
+        return 'facebook', build_facebook_frame(usernames, messages, dates), None
+
+    # The file is memory-mapped: it is hashed and scanned in place instead of being read and decoded whole
+    zipped = zipfile.is_zipfile(path)
+    with sniff.mapped_file(path) as content:
+        platform = sniff.zip_platform(path) if zipped else sniff.detect_platform(sniff.sample_text(content))
+        if platform is None:
+            raise ValueError("not a WhatsApp, Telegram or Facebook export")
+
+        key = cache.cache_key(cache.content_hash(content), platform) if use_cache else None
+        df = cache.load_frame(key) if key else None
+        if df is None:
+            df = sniff.parse_zip(path, platform) if zipped else sniff.parse_bytes(content, platform)
+            if key and not df.empty:
+                cache.store_frame(key, df)
+                incremental.record_ingest(key, content, aggregates.build_aggregates(df, platform))
+    return platform, df, key
+
+def user_stats(aggs):
+    cube = aggs['cube']
+    stats = cube.groupby('username', sort=False)[aggregates.CUBE_MEASURES].sum()
+    stats = stats.sort_values('messages', ascending=False)
+    stats.loc['Overall Users'] = cube[aggregates.CUBE_MEASURES].sum()
+    return stats.rename_axis('username').reset_index()
+
+def write_report(table, folder, name, fmt):
+    path = os.path.join(folder, f"{name}.{fmt}")
+    if fmt == 'parquet':
+        table.to_parquet(path, index=False)
+    else:
+        table.to_json(path, orient='records', force_ascii=False, date_format='iso', indent=1)
+
+def analyze_export(path, kind, out_dir, name, fmt='parquet', use_cache=True, top_n=20, num_topics=5):
+    # Parses one chat and writes its stats, emoji, TF-IDF and topic reports; never raises
+    timings = {}
+    summary = {'path': path, 'report': name}
+    try:
+        with _stage(timings, 'parse'):
+            platform, df, key = load_export(path, kind, use_cache)
+        summary.update(platform=platform, messages=len(df))
+        if df.empty:
+            raise ValueError("no messages found")
+        summary.update(users=int(df['username'].nunique()),
+                       first_message=str(df['date'].min()), last_message=str(df['date'].max()))
+
+        reports = {}
+        with _stage(timings, 'stats'):
+            aggs = aggregates.load_aggregates(key) if key else None
+            aggs = aggs if aggs is not None else aggregates.build_aggregates(df, platform)
+            reports['stats'] = user_stats(aggs)
+        with _stage(timings, 'emoji'):
+            reports['emoji'] = aggregates.emoji_table(aggs)
+        with _stage(timings, 'tfidf'):
+            chat_corpus = corpus.chat_corpus(df, platform=platform)
+            if chat_corpus is not None:
+                reports['tfidf'] = pd.DataFrame(corpus.top_terms(chat_corpus, top_n), columns=['Word', 'TF-IDF Score'])
+        with _stage(timings, 'topics'):
+            if chat_corpus is not None:
+                # One worker per chat already; the fit itself stays single-core
+                model = topics.build_topic_model(chat_corpus, num_topics, n_jobs=1)
+                words = topics.topic_words(model, top_n=10, excluded=corpus.EXCLUDED_TERMS)
+                reports['topics'] = pd.DataFrame({'topic': range(1, len(words) + 1),
+                                                  'words': [' | '.join(w) for w in words]})
+                summary['topic_model'] = model['stats']
+
+        with _stage(timings, 'write'):
+            folder = os.path.join(out_dir, name)
+            os.makedirs(folder, exist_ok=True)
+            for report, table in reports.items():
+                write_report(table, folder, report, fmt)
+    except Exception as e:
+        summary['error'] = str(e)
+
+    summary['timings'] = timings
+    if 'platform' in summary and 'error' not in summary:
+        with open(os.path.join(out_dir, name, 'summary.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=1, ensure_ascii=False, default=str)
+    return summary
+
+# -------------------------------
+# Progress and Timing
+# -------------------------------
+def print_progress(done, total, label, width=30, stream=sys.stderr):
+    filled = int(width * done / total) if total else width
+    stream.write(f"\r[{'#' * filled}{'.' * (width - filled)}] {done}/{total} {label[:40]:<40}")
+    if done == total:
+        stream.write("\n")
+    stream.flush()
+
+def timing_summary(results, wall_seconds):
+    rows = []
+    for stage in STAGES:
+        seconds = [r['timings'][stage] for r in results if stage in r['timings']]
+        if seconds:
+            rows.append((stage, len(seconds), sum(seconds), sum(seconds) / len(seconds), max(seconds)))
+    lines = [f"{'stage':<8} {'chats':>6} {'total s':>9} {'mean s':>8} {'max s':>8}"]
+    lines += [f"{stage:<8} {count:>6} {total:>9.2f} {mean:>8.2f} {peak:>8.2f}" for stage, count, total, mean, peak in rows]
+    messages = sum(r.get('messages', 0) for r in results)
+    lines.append(f"wall time {wall_seconds:.2f}s for {messages:,} messages "
+                 f"({messages / wall_seconds if wall_seconds else 0:,.0f} messages/s)")
+    return "\n".join(lines)
+
+# -------------------------------
+# Command Line
+# -------------------------------
+def run(paths, out_dir, fmt='parquet', max_workers=None, use_cache=True, top_n=20, num_topics=5):
+    exports = find_exports(paths)
+    os.makedirs(out_dir, exist_ok=True)
+    names = unique_names([report_name(path, paths) for path, _ in exports])
+    jobs = [(path, kind, out_dir, name, fmt, use_cache, top_n, num_topics)
+            for (path, kind), name in zip(exports, names)]
+
+    start = time.perf_counter()
+    results = []
+    print_progress(0, len(jobs), "")
+    if len(jobs) <= 1 or max_workers == 1:
+        for job in jobs:
+            results.append(analyze_export(*job))
+            print_progress(len(results), len(jobs), results[-1]['report'])
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(analyze_export, *job) for job in jobs]
+            for future in as_completed(futures):
+                results.append(future.result())
+                print_progress(len(results), len(jobs), results[-1]['report'])
+    return results, time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python cli.py",
+                                     description="Analyze WhatsApp, Telegram and Facebook exports without the web app.")
+    parser.add_argument("paths", nargs="+", help="export files or folders to search for exports")
+    parser.add_argument("--out", default="reports", help="folder for the per-chat reports (default: reports)")
+    parser.add_argument("--format", choices=["parquet", "json"], default="parquet")
+    parser.add_argument("--workers", type=int, help="parallel chats (default: one per CPU)")
+    parser.add_argument("--no-cache", action="store_true", help="parse every file even if it is cached")
+    parser.add_argument("--top", type=int, default=20, help="TF-IDF keywords per chat")
+    parser.add_argument("--topics", type=int, default=5, help="LDA topics per chat")
+    parser.add_argument("--urls", choices=URL_METHODS,
+                        help="link counting: fast compiled pattern (default) or exact URLExtract matching")
+    args = parser.parse_args(argv)
+    if args.urls:
+        # Read by the parsers and the cache key, here and in the worker processes
+        os.environ["CONVERSIGHT_URL_METHOD"] = args.urls
+
+    results, wall_seconds = run(args.paths, args.out, args.format, args.workers, not args.no_cache,
+                                args.top, args.topics)
+
+    failed = [r for r in results if 'error' in r]
+    print(f"{len(results) - len(failed)} chats analysed, reports in {args.out}")
+    for r in failed:
+        print(f"  skipped {r['path']}: {r['error']}")
+    print(timing_summary(results, wall_seconds))
+    return 1 if failed and len(failed) == len(results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
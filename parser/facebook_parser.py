@@ -1,75 +1,210 @@
+import io
+import json
+import os
 import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
-import emoji
-from urlextract import URLExtract
-from bs4 import BeautifulSoup
+from lxml import etree
+from utils.features import enrich_messages
 
-def preprocess_facebook(data):
-    soup = BeautifulSoup(data, 'html.parser')
-    messages = []
-    usernames = []
-    timestamps = []
+HTML_DATE_FORMAT = '%b %d, %Y %I:%M:%S %p'
+THREAD_FILE_PATTERN = re.compile(r'message_\d+\.(json|html)$')
 
-    try:
-        chat_blocks = soup.find_all('div', class_='_a6-g')
-
-        for block in chat_blocks:
-            user_tag = block.find('div', class_='_2ph_ _a6-h _a6-i')
-            message_tag = block.find('div', class_='_2ph_ _a6-p')
-            timestamp_tag = block.find('div', class_='_a72d')
-
-            username = user_tag.get_text(strip=True) if user_tag else None
-            timestamp = timestamp_tag.get_text(strip=True) if timestamp_tag else None
-
-            # Check if message_tag exists
-            if message_tag:
-                try:
-                    content_divs = message_tag.find_all('div')
-                    message_text = ""
-                    for div in content_divs:
-                        text = div.get_text(strip=True)
-                        if text and not text.lower().startswith("reacted"):
-                            message_text = text
-                            break
-                except Exception as e:
-                    message_text = ""  # If anything goes wrong, skip this message
-            else:
-                message_text = ""
-
-            if username and message_text:
-                messages.append(message_text)
-                usernames.append(username)
-                timestamps.append(timestamp)
+# -------------------------------
+# HTML Export
+# -------------------------------
+def _has_classes(element, *names):
+    classes = element.get('class', '').split()
+    return all(name in classes for name in names)
+
+def _find_div(parent, *names):
+    for element in parent.iterdescendants('div'):
+        if _has_classes(element, *names):
+            return element
+    return None
+
+def _stripped_text(element):
+    return ''.join(part.strip() for part in element.itertext())
+
+def _html_row(block):
+    user_tag = _find_div(block, '_2ph_', '_a6-h', '_a6-i')
+    message_tag = _find_div(block, '_2ph_', '_a6-p')
+    timestamp_tag = _find_div(block, '_a72d')
+
+    username = _stripped_text(user_tag) if user_tag is not None else None
+    timestamp = _stripped_text(timestamp_tag) if timestamp_tag is not None else None
+
+    message_text = ''
+    if message_tag is not None:
+        # The first non-empty inner div is the message; reaction lines come after it
+        for div in message_tag.iterdescendants('div'):
+            text = _stripped_text(div)
+            if text and not text.lower().startswith('reacted'):
+                message_text = text
+                break
 
+    if username and message_text:
+        return username, message_text, timestamp
+    return None
+
+def parse_facebook_html(source):
+    # Streams one HTML thread file (path or binary file object) into (username, message, raw_time) rows
+    rows = []
+    try:
+        for _, element in etree.iterparse(source, events=('end',), tag='div', html=True,
+                                          recover=True, encoding='utf-8'):
+            if not _has_classes(element, '_a6-g'):
+                continue
+            row = _html_row(element)
+            if row is not None:
+                rows.append(row)
+            element.clear()
+            parent = element.getparent()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
     except Exception as e:
         print(f"Error during HTML parsing: {e}")
+    return rows
+
+def parse_html_dates(raw_times):
+    raw_times = pd.Series(raw_times, dtype=object)
+    dates = pd.to_datetime(raw_times, format=HTML_DATE_FORMAT, errors='coerce')
+    # Exports made in other locales fall back to format inference
+    missing = dates.isna() & raw_times.notna()
+    if missing.any():
+        dates[missing] = pd.to_datetime(raw_times[missing], errors='coerce')
+    return dates
+
+# -------------------------------
+# JSON Export
+# -------------------------------
+def _fix_encoding(text):
+    # Facebook writes UTF-8 bytes as Latin-1 code points, so "😀" arrives as "ð\x9f\x98\x80"
+    try:
+        return text.encode('latin-1').decode('utf-8')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return text
+
+def parse_facebook_json(source):
+    # One message_N.json file (path, text or parsed dict) into (username, message, timestamp_ms) rows
+    if isinstance(source, dict):
+        data = source
+    elif isinstance(source, str) and source.lstrip().startswith('{'):
+        data = json.loads(source)
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+    rows = []
+    # Messages are stored newest first
+    for message in reversed(data.get('messages', [])):
+        username = _fix_encoding(message.get('sender_name', ''))
+        if message.get('is_unsent'):
+            text = f"{username} unsent a message"
+        else:
+            text = _fix_encoding(message.get('content', '')).strip()
+        if username and text:
+            rows.append((username, text, message.get('timestamp_ms')))
+    return rows, _fix_encoding(data.get('title', ''))
 
-    # Convert to DataFrame
+# -------------------------------
+# DataFrame Assembly
+# -------------------------------
+def build_facebook_frame(usernames, messages, dates, threads=None):
     df = pd.DataFrame({
-        'username': usernames,
-        'message': messages,
-        'date': pd.to_datetime(timestamps, errors='coerce')
+        'username': pd.Series(usernames, dtype=object),
+        'message': pd.Series(messages, dtype=object),
+        'date': dates
     })
+    if threads is not None:
+        df['thread'] = pd.Categorical(threads)
 
-    # Add time features
-    df['year'] = df['date'].dt.year
-    df['month'] = df['date'].dt.month_name()
-    df['day'] = df['date'].dt.day_name()
-    df['hour'] = df['date'].dt.hour
-    df['minute'] = df['date'].dt.minute
-    df['time'] = df['date'].dt.strftime('%I:%M %p')
-
-    # Word, emoji, URL count
-    df['total_word'] = df['message'].apply(lambda x: len(str(x).split()))
-    df['emoji_count'] = df['message'].apply(emoji.emoji_count)
-    extractor = URLExtract()
-    df['url_count'] = df['message'].apply(lambda x: len(extractor.find_urls(x)))
-
-    # Period of Day
-    df['period'] = df['hour'].apply(lambda x: (
-        'Night' if 0 <= x < 6 else
-        'Morning' if 6 <= x < 12 else
-        'Afternoon' if 12 <= x < 18 else
-        'Evening'))
+    df = enrich_messages(df, 'facebook')
 
     return df
+
+def _json_dates(timestamps_ms):
+    return pd.to_datetime(pd.Series(timestamps_ms, dtype='float64'), unit='ms', errors='coerce')
+
+def preprocess_facebook(data):
+    # Accepts the text of one HTML or JSON thread file
+    if data.lstrip().startswith('{'):
+        rows, _ = parse_facebook_json(data)
+        usernames, messages, stamps = zip(*rows) if rows else ((), (), ())
+        return build_facebook_frame(usernames, messages, _json_dates(stamps))
+
+    rows = parse_facebook_html(io.BytesIO(data.encode('utf-8')))
+    usernames, messages, raw_times = zip(*rows) if rows else ((), (), ())
+    return build_facebook_frame(usernames, messages, parse_html_dates(raw_times))
+
+# -------------------------------
+# Whole Inbox Ingestion
+# -------------------------------
+def list_facebook_threads(inbox_path):
+    # Thread folders under inbox/ that hold message_N.json or message_N.html files
+    threads = []
+    for entry in sorted(os.scandir(inbox_path), key=lambda e: e.name):
+        if entry.is_dir() and any(THREAD_FILE_PATTERN.match(n) for n in os.listdir(entry.path)):
+            threads.append(entry.path)
+    return threads
+
+def parse_facebook_thread(thread_path):
+    # Returns (title, usernames, messages, dates) for one thread; JSON is preferred when both exist
+    names = [n for n in os.listdir(thread_path) if THREAD_FILE_PATTERN.match(n)]
+    json_files = sorted((n for n in names if n.endswith('.json')), key=lambda n: int(re.findall(r'\d+', n)[0]))
+    html_files = sorted((n for n in names if n.endswith('.html')), key=lambda n: int(re.findall(r'\d+', n)[0]))
+    title = os.path.basename(thread_path)
+
+    if json_files:
+        rows = []
+        # message_1.json holds the newest messages, so older files come first
+        for name in reversed(json_files):
+            file_rows, file_title = parse_facebook_json(os.path.join(thread_path, name))
+            rows.extend(file_rows)
+            title = file_title or title
+        usernames, messages, stamps = zip(*rows) if rows else ((), (), ())
+        return title, list(usernames), list(messages), _json_dates(stamps)
+
+    rows = []
+    for name in html_files:
+        rows.extend(parse_facebook_html(os.path.join(thread_path, name)))
+    usernames, messages, raw_times = zip(*rows) if rows else ((), (), ())
+    return title, list(usernames), list(messages), parse_html_dates(raw_times)
+
+def preprocess_facebook_inbox(inbox_path, max_workers=None):
+    # Parses every thread of an inbox/ folder on a process pool into one frame with a 'thread' column.
+    # df.attrs['messages_per_second'] records parse throughput.
+    start = time.perf_counter()
+    threads = list_facebook_threads(inbox_path)
+
+    if len(threads) <= 1 or max_workers == 1:
+        results = [parse_facebook_thread(thread) for thread in threads]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(parse_facebook_thread, threads))
+
+    usernames, messages, dates, thread_names = [], [], [], []
+    for title, thread_users, thread_messages, thread_dates in results:
+        usernames.extend(thread_users)
+        messages.extend(thread_messages)
+        dates.append(thread_dates)
+        thread_names.extend([title] * len(thread_users))
+
+    dates = pd.concat(dates, ignore_index=True) if dates else pd.Series([], dtype='datetime64[ns]')
+    df = build_facebook_frame(usernames, messages, dates, thread_names)
+
+    elapsed = time.perf_counter() - start
+    df.attrs['messages_per_second'] = len(df) / elapsed if elapsed else float('inf')
+    return df
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("Usage: python -m parser.facebook_parser <path/to/inbox>")
+        sys.exit(1)
+    inbox = preprocess_facebook_inbox(sys.argv[1])
+    print(f"{len(inbox)} messages from {inbox['thread'].nunique()} threads "
+          f"({inbox.attrs['messages_per_second']:,.0f} messages/s)")
@@ -0,0 +1,113 @@
+import mmap
+import os
+import zipfile
+from contextlib import contextmanager
+
+from parser.facebook_parser import preprocess_facebook
+from parser.telegram_parser import PAGE_PATTERN, preprocess_telegram_export, preprocess_telegram_html
+from parser.whatsapp_formats import detect_format, sample_text
+from parser.whatsapp_parser import find_chat_member, preprocess_whatsapp, preprocess_whatsapp_bytes, preprocess_whatsapp_zip
+
+PLATFORMS = ["whatsapp", "telegram", "facebook"]
+
+# -------------------------------
+# Format Checks
+# -------------------------------
+# The same checks the upload page has always used to warn about a wrong file; WhatsApp exports
+# are recognised by any registered timestamp format in their first lines
+def is_whatsapp(text):
+    return detect_format(text) is not None
+
+def is_telegram_json(text):
+    # Telegram Desktop's "Machine-readable JSON" export (result.json); only its HTML export is parsed
+    return text.lstrip().startswith("{") and ('"from_id"' in text or '"date_unixtime"' in text)
+
+def is_telegram(text):
+    return "<div class=\"message default clearfix\"" in text or is_telegram_json(text)
+
+def is_facebook_json(text):
+    # message_N.json: a participants list, and messages with sender_name and timestamp_ms
+    return (text.lstrip().startswith("{") and not is_telegram_json(text)
+            and all(key in text for key in ('"participants"', '"sender_name"', '"timestamp_ms"')))
+
+def is_facebook(text):
+    return is_facebook_json(text) or ("_a6-g" in text and "_a6-h" in text)
+
+SNIFFERS = {
+    "whatsapp": is_whatsapp,
+    "telegram": is_telegram,
+    "facebook": is_facebook,
+}
+
+def looks_like(text, platform):
+    return SNIFFERS[platform.lower()](text)
+
+def detect_platform(text):
+    # HTML and JSON exports are recognised by their markup first; WhatsApp's check is the loosest
+    for platform in ["telegram", "facebook", "whatsapp"]:
+        if SNIFFERS[platform](text):
+            return platform
+    return None
+
+# -------------------------------
+# Parsing
+# -------------------------------
+PARSERS = {
+    "whatsapp": preprocess_whatsapp,
+    "telegram": preprocess_telegram_html,
+    "facebook": preprocess_facebook,
+}
+
+def _parse_text(text, platform):
+    if platform == "telegram" and is_telegram_json(text):
+        raise ValueError("Telegram JSON exports are not supported; export the chat as HTML")
+    return PARSERS[platform](text)
+
+def parse_export(text, platform=None):
+    # Parses one exported file; platform is detected when not given. Returns None for unknown files.
+    platform = (platform or detect_platform(text) or "").lower()
+    if platform not in PARSERS:
+        return None
+    return _parse_text(text, platform)
+
+def parse_bytes(buffer, platform=None):
+    # Parses an export held as bytes, a memoryview or an mmap. WhatsApp is scanned as bytes; the
+    # HTML/JSON parsers need the decoded text.
+    platform = (platform or detect_platform(sample_text(buffer)) or "").lower()
+    if platform == "whatsapp":
+        return preprocess_whatsapp_bytes(buffer)
+    if platform not in PARSERS:
+        return None
+    return _parse_text(str(buffer[:], "utf-8"), platform)
+
+@contextmanager
+def mapped_file(path):
+    # Read-only memory map of a file; empty files (which cannot be mapped) give b""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            yield view
+
+# -------------------------------
+# Zipped Exports
+# -------------------------------
+def zip_platform(source):
+    # Platform of a zipped export (path or binary file object): Telegram archives hold messages*.html
+    # pages, WhatsApp exports "with media" hold the chat as a .txt next to the media files
+    with zipfile.ZipFile(source) as archive:
+        if any(PAGE_PATTERN.search(os.path.basename(name)) for name in archive.namelist()):
+            return "telegram"
+        if find_chat_member(archive) is not None:
+            return "whatsapp"
+    return None
+
+def parse_zip(source, platform=None):
+    # Members are streamed out of the archive; nothing is extracted to disk
+    platform = (platform or zip_platform(source) or "").lower()
+    if platform == "telegram":
+        return preprocess_telegram_export(source)
+    if platform == "whatsapp":
+        return preprocess_whatsapp_zip(source)
+    return None
@@ -1,83 +1,134 @@
-from bs4 import BeautifulSoup
+import io
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
-import emoji
-from urlextract import URLExtract
-from datetime import datetime
+from lxml import etree
+from utils.features import enrich_messages
 
-def preprocess_telegram_html(html_text):
-    soup = BeautifulSoup(html_text, 'html.parser')
+DATE_FORMAT = "%d.%m.%Y %H:%M:%S"
+PAGE_PATTERN = re.compile(r'messages(\d*)\.html$')
 
-    messages = []
-    usernames = []
-    timestamps = []
+# -------------------------------
+# Streaming Page Parser
+# -------------------------------
+def _has_classes(element, *names):
+    classes = element.get("class", "").split()
+    return all(name in classes for name in names)
 
-    current_username = None
+def _find_div(parent, *names):
+    for element in parent.iterdescendants("div"):
+        if _has_classes(element, *names):
+            return element
+    return None
 
-    for msg in soup.find_all("div", class_="message"):
-        body = msg.find("div", class_="body")
-        if not body:
-            continue
+def _message_row(msg):
+    body = _find_div(msg, "body")
+    if body is None:
+        return None
 
-        time_tag = body.find("div", class_="pull_right date details")
-        user_tag = body.find("div", class_="from_name")
-        text_tag = body.find("div", class_="text")
+    time_tag = _find_div(body, "pull_right", "date", "details")
+    # Ignore system messages that don’t have time
+    if time_tag is None:
+        return None
 
-        # Ignore system messages that don’t have time
-        if not time_tag:
+    user_tag = _find_div(body, "from_name")
+    text_tag = _find_div(body, "text")
+
+    # None means "same sender as the previous message"; resolved once all pages are joined
+    username = "".join(user_tag.itertext()).strip() if user_tag is not None else None
+
+    if text_tag is not None:
+        # Include text from nested tags (like <a>, <span>, <strong>)
+        text = " ".join(part.strip() for part in text_tag.itertext() if part.strip())
+    else:
+        # If no text div is found, treat it as empty message
+        text = "[Media or system message]"
+
+    return username, text, time_tag.get("title")
+
+def parse_telegram_page(source):
+    # Streams one exported page (path or binary file object) and returns (username, text, raw_time) rows.
+    # Each message block is cleared once read, so memory stays flat however long the page is.
+    rows = []
+    for _, element in etree.iterparse(source, events=("end",), tag="div", html=True,
+                                      recover=True, encoding="utf-8"):
+        if not _has_classes(element, "message"):
             continue
 
-        # Parse timestamp
-        raw_time = time_tag.get("title")
-        try:
-            timestamp = datetime.strptime(raw_time.split(" UTC")[0], "%d.%m.%Y %H:%M:%S")
-        except Exception:
-            timestamp = pd.NaT
-
-        # Update current username
-        if user_tag:
-            current_username = user_tag.text.strip()
-        username = current_username if current_username else "Unknown"
-
-        # Handle message text (even if it's a sticker or media caption)
-        if text_tag:
-            # Include text from nested tags (like <a>, <span>, <strong>)
-            text = text_tag.get_text(separator=" ", strip=True)
-        else:
-            # If no text div is found, treat it as empty message
-            text = "[Media or system message]"
+        row = _message_row(element)
+        if row is not None:
+            rows.append(row)
+
+        element.clear()
+        parent = element.getparent()
+        if parent is not None:
+            while element.getprevious() is not None:
+                del parent[0]
+    return rows
+
+def _parse_zip_page(archive_path, member):
+    with zipfile.ZipFile(archive_path) as archive, archive.open(member) as page:
+        return parse_telegram_page(page)
 
-        messages.append(text)
-        usernames.append(username)
-        timestamps.append(timestamp)
+def build_telegram_frame(rows):
+    usernames, messages, raw_times = zip(*rows) if rows else ((), (), ())
+
+    # Update current username: carry the last named sender forward, across page boundaries too
+    usernames = pd.Series(usernames, dtype=object).ffill().fillna("Unknown")
+    raw_times = pd.Series(raw_times, dtype=object).str.split(" UTC").str[0]
 
-    # Create DataFrame
     df = pd.DataFrame({
         "username": usernames,
-        "message": messages,
-        "date": pd.to_datetime(timestamps, errors='coerce')
+        "message": pd.Series(messages, dtype=object),
+        "date": pd.to_datetime(raw_times, format=DATE_FORMAT, errors='coerce')
     })
 
-    # Add derived time columns
-    if pd.api.types.is_datetime64_any_dtype(df['date']):
-        df["year"] = df["date"].dt.year
-        df["month"] = df["date"].dt.month_name()
-        df["day"] = df["date"].dt.day_name()
-        df["hour"] = df["date"].dt.hour
-        df["minute"] = df["date"].dt.minute
+    df = enrich_messages(df, "telegram")
+
+    return df
+
+def preprocess_telegram_html(html_text):
+    return build_telegram_frame(parse_telegram_page(io.BytesIO(html_text.encode("utf-8"))))
+
+# -------------------------------
+# Multi-Page Exports
+# -------------------------------
+def _page_order(name):
+    number = PAGE_PATTERN.search(name).group(1)
+    return int(number) if number else 1
+
+def list_telegram_pages(path):
+    # messages.html, messages2.html, ... in page order, from an export folder or a .zip of it (path or file object)
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            names = [n for n in archive.namelist() if PAGE_PATTERN.search(os.path.basename(n))]
     else:
-        df["year"] = df["month"] = df["day"] = df["hour"] = df["minute"] = None
+        names = [os.path.join(path, n) for n in os.listdir(path) if PAGE_PATTERN.search(n)]
+    return sorted(names, key=lambda n: _page_order(os.path.basename(n)))
 
-    # Word, URL, Emoji stats
-    extractor = URLExtract()
-    df["total_word"] = df["message"].apply(lambda x: len(str(x).split()))
-    df["url_count"] = df["message"].apply(lambda x: len(extractor.find_urls(x)))
-    df["emoji_count"] = df["message"].apply(lambda x: emoji.emoji_count(str(x)))
+def preprocess_telegram_export(path, max_workers=None):
+    # Parses every page of an export; pages are independent until the sender carry-over,
+    # so they are parsed in parallel and stitched together in page order.
+    pages = list_telegram_pages(path)
+    is_zip = zipfile.is_zipfile(path)
+    if not isinstance(path, (str, os.PathLike)):
+        # An uploaded archive (file object) is read in this process rather than copied to each worker
+        max_workers = 1
 
-    df["period"] = df["hour"].apply(lambda x: (
-        "Night" if pd.notnull(x) and 0 <= x < 6 else
-        "Morning" if pd.notnull(x) and 6 <= x < 12 else
-        "Afternoon" if pd.notnull(x) and 12 <= x < 18 else
-        "Evening" if pd.notnull(x) else None
-    ))
+    if len(pages) <= 1 or max_workers == 1:
+        if is_zip:
+            results = [_parse_zip_page(path, page) for page in pages]
+        else:
+            results = [parse_telegram_page(page) for page in pages]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            if is_zip:
+                results = list(pool.map(_parse_zip_page, [path] * len(pages), pages))
+            else:
+                results = list(pool.map(parse_telegram_page, pages))
 
-    return df
+    rows = [row for page_rows in results for row in page_rows]
+    return build_telegram_frame(rows)
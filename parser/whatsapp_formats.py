@@ -0,0 +1,140 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Lines looked at when guessing an export's format
+SAMPLE_LINES = 200
+SAMPLE_CHARS = 64 * 1024
+DEFAULT_FORMAT = "android-dmy-12h"
+
+# -------------------------------
+# Format Registry
+# -------------------------------
+# Exports differ by app (Android "date, time - " vs iOS "[date, time] "), by locale (day or month
+# first, "/", "." or "-" between fields, 2- or 4-digit years) and by clock (12h with am/pm or 24h).
+# iOS adds seconds and may start lines with a left-to-right mark (or the file with a BOM); newer
+# exports put a narrow no-break space before am/pm, which \s matches.
+_DATE = r"(?P<first>\d{1,2})[/.-](?P<second>\d{1,2})[/.-](?P<year>\d{4}|\d{2})"
+_CLOCKS = {
+    "12h": r"(?P<hour>\d{1,2})[:.](?P<minute>\d{2})(?:[:.](?P<seconds>\d{2}))?\s?(?P<ampm>[apAP]\.?\s?[mM]\.?)",
+    "24h": r"(?P<hour>\d{1,2})[:.](?P<minute>\d{2})(?:[:.](?P<seconds>\d{2}))?",
+}
+_LAYOUTS = {
+    "android": r"(?:\u200e|\ufeff)?({date},?\s{time}\s(?:-|\u2013)\s)",
+    "ios": r"(?:\u200e|\ufeff)?(\[{date},?\s{time}\]\s)",
+}
+# The same patterns over raw UTF-8 bytes, where \s is ASCII-only and non-ASCII marks are byte runs
+_UTF8_TOKENS = {
+    r"\u200e": r"\xe2\x80\x8e",
+    r"\ufeff": r"\xef\xbb\xbf",
+    r"\u2013": r"\xe2\x80\x93",
+    r"\s": r"(?:\s|\xe2\x80\xaf|\xc2\xa0)",
+}
+
+def _bytes_pattern(source):
+    for token, replacement in _UTF8_TOKENS.items():
+        source = source.replace(token, replacement)
+    # Headers open a line anywhere in the buffer
+    return re.compile(b"(?m)^" + source.encode("ascii"))
+
+def _register():
+    formats = {}
+    # Day-first before month-first: when a sample fits both, the day-first reading wins
+    for layout, template in _LAYOUTS.items():
+        for order in ["dmy", "mdy"]:
+            for clock, time_pattern in _CLOCKS.items():
+                source = template.format(date=_DATE, time=time_pattern)
+                formats[f"{layout}-{order}-{clock}"] = {
+                    "pattern": re.compile(source),
+                    "bytes_pattern": _bytes_pattern(source),
+                    "order": order,
+                    "clock": clock,
+                }
+    return formats
+
+FORMATS = _register()
+
+def header_pattern(name=None):
+    # Matches a message's timestamp header at the start of a line; group 1 is the whole header
+    return FORMATS[name or DEFAULT_FORMAT]["pattern"]
+
+def header_bytes_pattern(name=None):
+    # header_pattern for UTF-8 bytes, found with finditer anywhere in a buffer
+    return FORMATS[name or DEFAULT_FORMAT]["bytes_pattern"]
+
+# -------------------------------
+# Detection
+# -------------------------------
+def _valid(match, fmt):
+    day, month = int(match["first"]), int(match["second"])
+    if fmt["order"] == "mdy":
+        day, month = month, day
+    hour, minute = int(match["hour"]), int(match["minute"])
+    hours_ok = 1 <= hour <= 12 if fmt["clock"] == "12h" else hour <= 23
+    return 1 <= day <= 31 and 1 <= month <= 12 and hours_ok and minute <= 59
+
+def sample_text(buffer):
+    # Start and end of a bytes-like buffer (bytes, memoryview, mmap) as text, for detection
+    if len(buffer) <= 2 * SAMPLE_CHARS:
+        return str(buffer[:], "utf-8", errors="ignore")
+    return str(buffer[:SAMPLE_CHARS], "utf-8", errors="ignore") + "\n" + str(buffer[-SAMPLE_CHARS:], "utf-8", errors="ignore")
+
+def sample_lines(text, n=SAMPLE_LINES):
+    # Lines from both ends: a busy chat's first lines may all fall on one day, where 3/4 reads either way
+    head = text[:SAMPLE_CHARS].splitlines()[:n // 2]
+    tail = text[-SAMPLE_CHARS:].splitlines()[-(n - n // 2):] if len(text) > SAMPLE_CHARS else []
+    return head + tail
+
+def detect_format(lines):
+    # Name of the registered format that reads the most sampled lines as valid timestamps, or None
+    if isinstance(lines, str):
+        lines = sample_lines(lines)
+    best, best_hits = None, 0
+    for name, fmt in FORMATS.items():
+        hits = 0
+        for line in lines:
+            match = fmt["pattern"].match(line)
+            hits += match is not None and _valid(match, fmt)
+        if hits > best_hits:
+            best, best_hits = name, hits
+    return best
+
+# -------------------------------
+# Vectorized Parsing
+# -------------------------------
+def _numbers(values):
+    # Each field has few distinct values (days, hours, minutes), so each is converted once; None -> NaN
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    lookup = np.array([float(u) for u in uniques] + [np.nan])
+    return lookup[codes]
+
+def parse_headers(headers, name=None):
+    # Timestamps of many headers at once. Headers repeat within the same minute, so each distinct
+    # one is matched once with the format's own pattern and the fields are assembled numerically;
+    # no per-row format inference or strptime happens.
+    fmt = FORMATS[name or DEFAULT_FORMAT]
+    codes, uniques = pd.factorize(pd.Series(headers, dtype=object))
+    if len(uniques) == 0:
+        return pd.Series(np.full(len(codes), np.datetime64("NaT"), dtype="datetime64[ns]"))
+
+    pattern = fmt["pattern"]
+    names = list(pattern.groupindex)
+    empty = (None,) * len(names)
+    rows = [match.group(*names) if match else empty for match in map(pattern.match, uniques)]
+    fields = dict(zip(names, zip(*rows)))
+
+    day, month = _numbers(fields["first"]), _numbers(fields["second"])
+    if fmt["order"] == "mdy":
+        day, month = month, day
+    year = _numbers(fields["year"])
+    year = np.where(year < 100, year + 2000, year)
+    hour = _numbers(fields["hour"])
+    if fmt["clock"] == "12h":
+        pm = np.array([bool(value) and value[0] in "pP" for value in fields["ampm"]])
+        hour = hour % 12 + np.where(pm, 12, 0)
+    seconds = np.nan_to_num(_numbers(fields["seconds"]))
+
+    dates = pd.to_datetime({"year": year, "month": month, "day": day, "hour": hour,
+                            "minute": _numbers(fields["minute"]), "second": seconds}, errors="coerce")
+    return pd.Series(dates.to_numpy()[codes])
@@ -1,38 +1,180 @@
+import io
+import mmap
+import os
 import re
+import zipfile
+from itertools import chain, islice
+
 import pandas as pd
-import emoji
-from urlextract import URLExtract
-
-def preprocess_whatsapp(data):
-    # Preprocessing for WhatsApp chat
-    pattern = r'(\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}\s[apAP][mM]\s-\s)'
-    parts = re.split(pattern, data)
-    messages = [part for part in parts if part and not re.match(pattern, part)]
-    dates = [date.replace('\u202f', ' ') for date in re.findall(pattern, data)]
-
-    df = pd.DataFrame({'user_message': messages, 'date': dates})
-    df['date'] = pd.to_datetime(df['date'], format='%d/%m/%Y, %I:%M %p - ')
-
-    pattern_for_username = r'([^:]+):'
-    df['username'] = df['user_message'].str.extract(pattern_for_username)
-    df['message'] = df['user_message'].str.replace(pattern_for_username, '', regex=True).str.strip()
-    df.drop(columns=['user_message'], inplace=True)
+from parser.whatsapp_formats import (SAMPLE_CHARS, SAMPLE_LINES, detect_format, header_bytes_pattern, header_pattern,
+                                     parse_headers, sample_text)
+from utils.features import enrich_messages
+
+USERNAME_PATTERN = r'([^:]+):'
+# The chat inside an export "with media": _chat.txt on iOS, "WhatsApp Chat with <name>.txt" on Android
+CHAT_MEMBER_PATTERN = re.compile(r'(?:^|/)(?:_chat|WhatsApp Chat[^/]*)\.txt$', re.IGNORECASE)
 
-    df['year'] = df['date'].dt.year
-    df['month'] = df['date'].dt.month_name()
-    df['day'] = df['date'].dt.day_name()
-    df['hour'] = df['date'].dt.hour
-    df['minute'] = df['date'].dt.minute
-    df['time'] = df['date'].dt.strftime('%I:%M %p')
+# -------------------------------
+# Message Splitting
+# -------------------------------
+def iter_whatsapp_messages(lines, fmt=None):
+    # Yields (header, user_message) pairs; lines without a timestamp continue the previous message
+    pattern = header_pattern(fmt)
+    current_date = None
+    current_lines = []
 
-    df['total_word'] = df['message'].apply(lambda x: len(x.split()))
-    
-    extractor = URLExtract()
-    df['url_count'] = df['message'].apply(lambda x: len(extractor.find_urls(x)))
-    df['emoji_count'] = df['message'].apply(emoji.emoji_count)
+    for line in lines:
+        match = pattern.match(line)
+        if match:
+            if current_date is not None:
+                yield current_date, ''.join(current_lines)
+            current_date = match.group(1)
+            current_lines = [line[match.end():]]
+        elif current_date is not None:
+            current_lines.append(line)
 
-    df['period'] = df['hour'].apply(lambda x: 'Night' if 0 <= x < 6 else (
-        'Morning' if 6 <= x < 12 else ('Afternoon' if 12 <= x < 18 else 'Evening')))
+    if current_date is not None:
+        yield current_date, ''.join(current_lines)
+
+def build_whatsapp_frame(dates, user_messages, fmt=None):
+    df = pd.DataFrame({'user_message': pd.Series(user_messages, dtype=object),
+                       'date': parse_headers(dates, fmt)})
+
+    df['username'] = df['user_message'].str.extract(USERNAME_PATTERN)
+    df['message'] = df['user_message'].str.replace(USERNAME_PATTERN, '', regex=True).str.strip()
+    df.drop(columns=['user_message'], inplace=True)
 
     df = df.dropna(subset=['username'])
+    df = enrich_messages(df, 'whatsapp')
     return df
+
+# -------------------------------
+# Streaming Parser
+# -------------------------------
+def iter_whatsapp_batches(lines, batch_size=100_000, fmt=None):
+    # Parses any iterable of lines into DataFrame batches of at most batch_size messages (None = one batch).
+    # Without fmt the timestamp format is detected from the first lines (parser.whatsapp_formats).
+    if fmt is None:
+        lines = iter(lines)
+        head = list(islice(lines, SAMPLE_LINES))
+        fmt = detect_format(head)
+        lines = chain(head, lines)
+
+    dates, user_messages = [], []
+    offset = 0
+
+    for date, user_message in iter_whatsapp_messages(lines, fmt):
+        dates.append(date)
+        user_messages.append(user_message)
+        if batch_size and len(dates) >= batch_size:
+            batch = build_whatsapp_frame(dates, user_messages, fmt)
+            batch.index += offset
+            offset += len(dates)
+            dates, user_messages = [], []
+            yield batch
+
+    if dates:
+        batch = build_whatsapp_frame(dates, user_messages, fmt)
+        batch.index += offset
+        yield batch
+
+def sample_file(path, encoding='utf-8'):
+    # Start and end of a file on disk, for format detection without reading it all
+    with open(path, 'rb') as f:
+        head = f.read(SAMPLE_CHARS)
+        f.seek(max(f.tell(), os.path.getsize(path) - SAMPLE_CHARS))
+        tail = f.read()
+    return (head + b'\n' + tail).decode(encoding, errors='ignore')
+
+def iter_whatsapp_file(path, batch_size=100_000, encoding='utf-8', fmt=None):
+    # Reads the export line by line, so memory is bounded by batch_size and not the file size
+    fmt = fmt or detect_format(sample_file(path, encoding))
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        yield from iter_whatsapp_batches(f, batch_size, fmt)
+
+def whatsapp_to_parquet(path, out_path, batch_size=100_000, encoding='utf-8', fmt=None):
+    # Writes one Parquet row group per batch; returns the number of messages written
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    total = 0
+    try:
+        for batch in iter_whatsapp_file(path, batch_size, encoding, fmt):
+            table = pa.Table.from_pandas(batch, preserve_index=False)
+            if writer is None:
+                # Categorical index width depends on each batch's senders; one wide type fits them all
+                schema = pa.schema([field.with_type(pa.dictionary(pa.int32(), field.type.value_type, field.type.ordered))
+                                    if pa.types.is_dictionary(field.type) else field for field in table.schema],
+                                   metadata=table.schema.metadata)
+                writer = pq.ParquetWriter(out_path, schema)
+            writer.write_table(table.cast(schema))
+            total += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
+
+def preprocess_whatsapp(data, fmt=None):
+    # Preprocessing for WhatsApp chat; fmt names a format in parser.whatsapp_formats.FORMATS
+    batches = list(iter_whatsapp_batches(data.splitlines(keepends=True), batch_size=None, fmt=fmt))
+    return batches[0] if batches else build_whatsapp_frame([], [])
+
+# -------------------------------
+# Byte Scanning
+# -------------------------------
+def iter_whatsapp_spans(buffer, fmt=None):
+    # Yields (header, user_message) straight from UTF-8 bytes (bytes, memoryview or mmap): headers
+    # are found with a bytes pattern and only the spans between them are decoded, so the export
+    # never exists as one big str
+    previous = None
+    for match in header_bytes_pattern(fmt).finditer(buffer):
+        if previous is not None:
+            yield str(previous.group(1), 'utf-8'), str(buffer[previous.end():match.start()], 'utf-8')
+        previous = match
+    if previous is not None:
+        yield str(previous.group(1), 'utf-8'), str(buffer[previous.end():], 'utf-8')
+
+def preprocess_whatsapp_bytes(buffer, fmt=None):
+    fmt = fmt or detect_format(sample_text(buffer))
+    spans = list(iter_whatsapp_spans(buffer, fmt))
+    if not spans:
+        return build_whatsapp_frame([], [], fmt)
+    dates, user_messages = zip(*spans)
+    return build_whatsapp_frame(list(dates), list(user_messages), fmt)
+
+def preprocess_whatsapp_mmap(path, fmt=None):
+    # Server-side ingestion: the file is memory-mapped and scanned in place
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return build_whatsapp_frame([], [], fmt)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            return preprocess_whatsapp_bytes(view, fmt)
+
+# -------------------------------
+# Zipped Exports
+# -------------------------------
+def find_chat_member(archive):
+    names = [n for n in archive.namelist() if n.lower().endswith('.txt')]
+    chats = [n for n in names if CHAT_MEMBER_PATTERN.search(n)]
+    if chats:
+        return chats[0]
+    return names[0] if len(names) == 1 else None
+
+def iter_whatsapp_zip(source, batch_size=100_000, fmt=None):
+    # Streams the chat out of a zipped export (path or binary file object); nothing is extracted to disk.
+    # The format is detected from the start of the chat, since the end of a compressed member
+    # cannot be reached without inflating everything before it.
+    with zipfile.ZipFile(source) as archive:
+        member = find_chat_member(archive)
+        if member is None:
+            raise ValueError("no WhatsApp chat .txt found in the archive")
+        if fmt is None:
+            with archive.open(member) as raw:
+                fmt = detect_format(raw.read(SAMPLE_CHARS).decode('utf-8', errors='ignore'))
+        with archive.open(member) as raw, io.TextIOWrapper(raw, encoding='utf-8', newline='') as f:
+            yield from iter_whatsapp_batches(f, batch_size, fmt)
+
+def preprocess_whatsapp_zip(source, fmt=None):
+    batches = list(iter_whatsapp_zip(source, batch_size=None, fmt=fmt))
+    return batches[0] if batches else build_whatsapp_frame([], [], fmt)
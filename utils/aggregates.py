@@ -0,0 +1,107 @@
+import pandas as pd
+
+from utils import cache
+from utils.emojis import emoji_frequencies_by
+from utils.features import DAYS, MONTHS
+from utils.kinds import CONTACT, DELETED, EDITED, LOCATION, MEDIA, classify_messages, has_kind
+
+CUBE_KEYS = ['username', 'date', 'hour', 'period']
+CUBE_MEASURES = ['messages', 'words', 'media', 'urls', 'emojis', 'deleted', 'edited', 'contacts', 'locations']
+
+# Additive tables: the aggregates of a longer chat are the sum of those of its pieces
+AGGREGATE_KEYS = {
+    'cube': CUBE_KEYS,
+    'emoji': ['username', 'Emoji'],
+}
+
+# -------------------------------
+# Build / Merge
+# -------------------------------
+def build_cube(df, platform="generic"):
+    # One row per user x calendar day x hour (x period) with every count the dashboard shows
+    kinds = df['kind'].to_numpy() if 'kind' in df else classify_messages(df['message'], platform)
+    flag = lambda bit: has_kind(kinds, bit).astype('int64')
+    frame = pd.DataFrame({
+        # Plain strings: cubes of different exports are merged, and their sender categories differ
+        'username': df['username'].astype(object),
+        'date': df['date'].dt.normalize(),
+        'hour': df['hour'],
+        'period': df['period'],
+        'messages': 1,
+        # Parsed frames store counts as uint32; totals are summed in int64
+        'words': df['total_word'].astype('int64'),
+        'media': flag(MEDIA),
+        'urls': df['url_count'].astype('int64'),
+        'emojis': df['emoji_count'].astype('int64'),
+        'deleted': flag(DELETED),
+        'edited': flag(EDITED),
+        'contacts': flag(CONTACT),
+        'locations': flag(LOCATION),
+    })
+    return frame.groupby(CUBE_KEYS, observed=True, sort=False, dropna=False)[CUBE_MEASURES].sum().reset_index()
+
+def build_emoji_table(df):
+    # Every sender's emoji from one scan of the messages that have any
+    if 'emoji_count' in df:
+        df = df[df['emoji_count'] > 0]
+    table = emoji_frequencies_by(df['message'], df['username'])
+    return table.rename(columns={'group': 'username'})[['username', 'Emoji', 'Frequency']]
+
+def build_aggregates(df, platform="generic"):
+    return {'cube': build_cube(df, platform), 'emoji': build_emoji_table(df)}
+
+def merge_aggregates(old, new):
+    merged = {}
+    for name, keys in AGGREGATE_KEYS.items():
+        combined = pd.concat([old[name], new[name]], ignore_index=True)
+        merged[name] = combined.groupby(keys, observed=True, sort=False, dropna=False).sum().reset_index()
+    return merged
+
+def load_aggregates(key):
+    tables = {name: cache.load_table(key, f'agg-{name}') for name in AGGREGATE_KEYS}
+    return None if any(table is None for table in tables.values()) else tables
+
+def store_aggregates(key, aggregates):
+    for name, table in aggregates.items():
+        cache.store_table(key, f'agg-{name}', table)
+
+# -------------------------------
+# Views
+# -------------------------------
+def for_user(table, user):
+    if user is None or user == 'Overall Users':
+        return table
+    return table[table['username'] == user]
+
+def totals(aggregates, user=None):
+    return for_user(aggregates['cube'], user)[CUBE_MEASURES].sum()
+
+def message_counts(aggregates):
+    counts = aggregates['cube'].groupby('username')['messages'].sum().sort_values(ascending=False)
+    return counts.rename_axis(None).rename('username')
+
+def emoji_table(aggregates, user=None):
+    table = for_user(aggregates['emoji'], user)
+    frequencies = table.groupby('Emoji')['Frequency'].sum().sort_values(ascending=False, kind='stable')
+    return frequencies.reset_index()
+
+def weekday_counts(aggregates, user=None):
+    cube = for_user(aggregates['cube'], user)
+    day = pd.Categorical(cube['date'].dt.day_name(), categories=DAYS, ordered=True)
+    return cube.groupby(day)['messages'].sum().reindex(DAYS).fillna(0).rename('day')
+
+def month_counts(aggregates, user=None):
+    cube = for_user(aggregates['cube'], user)
+    month = pd.Categorical(cube['date'].dt.month_name(), categories=MONTHS, ordered=True)
+    counts = cube.groupby(month)['messages'].sum()
+    counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+    return counts.rename_axis(None).rename('month')
+
+def day_period_heatmap(aggregates, user=None):
+    cube = for_user(aggregates['cube'], user)
+    day = pd.Categorical(cube['date'].dt.day_name(), categories=DAYS, ordered=True)
+    heatmap = cube.groupby([day, cube['period']])['messages'].sum().unstack().fillna(0)
+    return heatmap.rename_axis(index='day', columns='period')
+
+def active_days(aggregates, user=None):
+    return pd.DatetimeIndex(for_user(aggregates['cube'], user)['date'].dropna().unique()).sort_values()
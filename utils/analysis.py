@@ -1,36 +1,9 @@
-import re
-import emoji
+import io
 import pandas as pd
 import random
-from textblob import TextBlob
-from wordcloud import WordCloud
-import numpy as np
-from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
-from sklearn.decomposition import LatentDirichletAllocation
-from collections import Counter
-
-stop_words_list = ['deleted', 'null', 'omitted', 'message', 'media', 'photo', 'video', 'sticker', 'animation', 'voice message', 'file']
-
-# -------------------------------
-# Clean Messages
-# -------------------------------
-def clean_messages(messages, platform="generic", usernames=None):
-    if platform == "facebook":
-        exclude_patterns = ['unsent a message', 'edited a message', 'media']
-    elif platform == "telegram":
-        exclude_patterns = ['photo', 'video', 'sticker', 'animation', 'voice message', 'file', 'audio', 'location']
-    else:
-        exclude_patterns = ['<Media omitted>', 'This message was deleted', '<This message was edited>']
-
-    messages = messages[~messages.str.lower().str.contains('|'.join(exclude_patterns), na=False)]
-
-    if usernames is not None:
-        pattern = r'\b(?:' + '|'.join(re.escape(name.lower()) for name in usernames) + r')\b'
-        messages = messages.apply(lambda x: re.sub(pattern, '', x.lower()))
-    else:
-        messages = messages.str.lower()
-
-    return messages
+from utils import aggregates, cache, corpus, sentiment, streaks, timeseries, topics
+from utils.corpus import EXCLUDED_TERMS as stop_words_list
+from utils.emojis import emoji_frequencies
 
 # -------------------------------
 # --- Personality Summary ---
@@ -51,14 +24,13 @@ def personality_summary(stats):
 # -------------------------------
 # --- Longest Chat Streak ---
 # -------------------------------
-def longest_streak(df, user=None):
-    if user:
-        df = df[df['username'] == user]
-    df = df.sort_values(by="date")
-    df['day_diff'] = df['date'].diff().dt.days.fillna(0).astype(int)
-    streaks = (df['day_diff'] != 1).cumsum()
-    max_streak = df.groupby(streaks).size().max()
-    return max_streak
+def streak_stats(df, user=None, aggs=None):
+    # Longest and current streak of consecutive active days plus the longest silence (utils.streaks)
+    return streaks.user_streaks(_aggregates_for(df, aggs=aggs), user)
+
+def longest_streak(df, user=None, aggs=None):
+    stats = streak_stats(df, user, aggs)
+    return int(stats['longest_streak']) if stats is not None else 0
 
 # -------------------------------
 # --- Throwback Message ---
@@ -70,47 +42,14 @@ def throwback_message(df):
 # -------------------------------
 # Basic Stats
 # -------------------------------
-def fetch_stats(selected_user, df, platform="generic"):
-    try:
-        if selected_user != 'Overall Users':
-            df = df[df['username'] == selected_user]
-
-        total_messages = df.shape[0]
-        total_word_count = df['total_word'].sum()
-
-        if platform == "facebook":
-            media_keywords = ['image', 'video', 'sticker', 'file', 'attachment']
-        elif platform == "telegram":
-            media_keywords = ['photo', 'video', 'sticker', 'file', 'voice message', 'animation', 'audio']
-        else:
-            media_keywords = ['<Media omitted>']
-
-        total_media_messages = df['message'].str.lower().str.contains('|'.join(media_keywords), na=False).sum()
-        total_url_count = df['url_count'].sum()
-        total_emoji_count = df['emoji_count'].sum()
-
-        if platform == "facebook":
-            deleted_message = df[df['message'].str.contains("unsent a message", case=False, na=False)]
-            edited_messages = df[df['message'].str.contains("edited a message", case=False, na=False)]
-        elif platform == "telegram":
-            deleted_message = df[df['message'].str.contains("This message was deleted", case=False, na=False)]
-            edited_messages = pd.DataFrame()
-        else:
-            deleted_message = df[df['message'].str.contains("This message was deleted", case=False, na=False)]
-            edited_messages = df[df['message'].str.contains("<This message was edited>", case=False, na=False)]
+def _aggregates_for(df, platform="generic", aggs=None):
+    # Views read the precomputed chat cube when the app has one, and build it on the fly otherwise
+    return aggs if aggs is not None else {'cube': aggregates.build_cube(df, platform)}
 
-        phone_pattern = r'\+?\d{2,4}[\s-]?\d{10}'
-        shared_contacts = df[df['message'].str.contains(phone_pattern, case=False, na=False) |
-                             df['message'].str.contains('.vcf', case=False, na=False)]['message']
-
-        location_pattern = r'//maps\.google\.com/\?q=\d+\.\d+,\d+\.\d+'
-        shared_locations = df[df['message'].str.contains(location_pattern, case=False, na=False)]['message']
-
-        return (
-            total_messages, total_word_count, total_media_messages, total_url_count,
-            total_emoji_count, len(deleted_message), len(edited_messages),
-            len(shared_contacts), len(shared_locations)
-        )
+def fetch_stats(selected_user, df, platform="generic", aggs=None):
+    try:
+        totals = aggregates.totals(_aggregates_for(df, platform, aggs), selected_user)
+        return tuple(int(totals[measure]) for measure in aggregates.CUBE_MEASURES)
 
     except Exception as e:
         print(f"Error in fetching stats: {e}")
@@ -149,12 +88,18 @@ def fun_summary_comment(stats):
 # -------------------------------
 # Sentiment Analysis
 # -------------------------------
-def extract_sentiment(message):
+def extract_sentiment(message, backend="textblob"):
+    # Whole columns should go through utils.sentiment.chat_sentiment, which dedupes and caches
     try:
-        analysis = TextBlob(message)
-        if analysis.sentiment.polarity > 0:
+        if backend == "lexicon":
+            polarity = sentiment.lexicon_polarity([message])[0]
+        else:
+            from textblob import TextBlob
+
+            polarity = TextBlob(message).sentiment.polarity
+        if polarity > 0:
             return 'positive'
-        elif analysis.sentiment.polarity == 0:
+        elif polarity == 0:
             return 'neutral'
         else:
             return 'negative'
@@ -177,16 +122,12 @@ def check_mood_vibe(df):
 # -------------------------------
 # TF-IDF
 # -------------------------------
-def perform_tfidf_analysis(messages, platform="generic", usernames=None):
+def perform_tfidf_analysis(messages, platform="generic", usernames=None, kinds=None, chat_corpus=None):
+    # chat_corpus (utils.corpus) skips re-cleaning and re-tokenizing when the caller already has one
     try:
-        messages = clean_messages(messages, platform, usernames)
-        vectorizer = TfidfVectorizer(max_df=0.95, min_df=2, stop_words='english')
-        tfidf = vectorizer.fit_transform(messages)
-        words = vectorizer.get_feature_names_out()
-        word_scores = np.array(tfidf.sum(axis=0)).flatten()
-        filtered_words = [(words[i], word_scores[i]) for i in np.argsort(word_scores)[::-1]
-                          if words[i] not in stop_words_list]
-        return filtered_words[:5]
+        if chat_corpus is None:
+            chat_corpus = corpus.build_corpus(messages, platform, usernames, kinds)
+        return corpus.top_terms(chat_corpus, 5, stop_words_list)
     except Exception as e:
         print(f"Error in TF-IDF analysis: {e}")
         return []
@@ -194,21 +135,17 @@ def perform_tfidf_analysis(messages, platform="generic", usernames=None):
 # -------------------------------
 # LDA Topic Modeling
 # -------------------------------
-def perform_lda_analysis(messages, num_topics=5, platform="generic", usernames=None):
+def perform_lda_analysis(messages, num_topics=5, platform="generic", usernames=None, kinds=None, chat_corpus=None,
+                         model=None, learning_method=topics.LEARNING_METHOD):
+    # model is a persisted chat model (utils.topics.chat_topic_model); messages are then ranked against it
     try:
-        messages = clean_messages(messages, platform, usernames)
-        vectorizer = CountVectorizer(max_df=0.95, min_df=2, stop_words='english')
-        bow = vectorizer.fit_transform(messages)
-        words = vectorizer.get_feature_names_out()
-        lda = LatentDirichletAllocation(n_components=num_topics, random_state=0)
-        lda.fit(bow)
-
-        topic_words = []
-        for i, topic in enumerate(lda.components_):
-            top_words_array = topic.argsort()[-5:][::-1]
-            topic_list = [words[j] for j in top_words_array if words[j] not in stop_words_list]
-            topic_words.append(f"Topic {i + 1}: {' | '.join(topic_list)}")
-        return topic_words
+        if model is not None:
+            documents = None if chat_corpus is None else chat_corpus['documents']
+            return topics.describe_topics(model, documents, 5, stop_words_list)
+        if chat_corpus is None:
+            chat_corpus = corpus.build_corpus(messages, platform, usernames, kinds)
+        model = topics.build_topic_model(chat_corpus, num_topics, learning_method)
+        return topics.describe_topics(model, None, 5, stop_words_list)
     except Exception as e:
         print(f"Error in LDA analysis: {e}")
         return []
@@ -222,7 +159,8 @@ def perform_comparative_analysis(df, users_to_compare, start_date, end_date):
         end_date = pd.to_datetime(end_date) + pd.Timedelta(days=1)
         filtered_df = df[(df["date"] >= start_date) & (df["date"] < end_date)]
         user_filtered_df = filtered_df[filtered_df["username"].isin(users_to_compare)]
-        return user_filtered_df["username"].value_counts()
+        # Senders are categorical, and value_counts lists every category, chosen or not
+        return user_filtered_df["username"].value_counts()[lambda counts: counts > 0]
     except Exception as e:
         print(f"Error in comparative analysis: {e}")
         return pd.Series()
@@ -230,47 +168,50 @@ def perform_comparative_analysis(df, users_to_compare, start_date, end_date):
 # -------------------------------
 # Activity Insights
 # -------------------------------
-def most_least_busy_users(df):
+def most_least_busy_users(df, aggs=None):
     try:
-        counts = df['username'].value_counts()
+        counts = aggregates.message_counts(_aggregates_for(df, aggs=aggs))
         return counts.head(5), counts.tail(5)
     except Exception as e:
         print(f"Error in busy users analysis: {e}")
         return pd.Series(), pd.Series()
 
-def user_activity_over_time(selected_user, df):
+def user_activity_over_time(selected_user, df, aggs=None, chat_key=None, start=None, end=None,
+                            max_points=timeseries.DEFAULT_MAX_POINTS):
+    # Messages per user binned by hour/day/week/month so the visible range stays within max_points
     try:
-        if selected_user != 'Overall Users':
-            df = df[df['username'] == selected_user]
-        return df.groupby(['date', 'username'])['message'].count().unstack().fillna(0)
+        rollups = timeseries.chat_rollups(_aggregates_for(df, aggs=aggs), chat_key)
+        return timeseries.activity_series(rollups, selected_user, start, end, max_points)
     except Exception as e:
         print(f"Error in user activity over time: {e}")
         return pd.DataFrame()
 
-def week_activity_map(selected_user, df):
+def sentiment_over_time(df, max_points=timeseries.DEFAULT_MAX_POINTS):
+    # Long table of sentiment label counts per time bin, ready for a line plot
     try:
-        if selected_user != 'Overall Users':
-            df = df[df['username'] == selected_user]
-        days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        return df['day'].value_counts().reindex(days).fillna(0)
+        counts = timeseries.bin_counts(df['date'], df['Sentiment'], max_points)
+        return counts.rename_axis(columns='Sentiment').stack().reset_index(name='Counts')
+    except Exception as e:
+        print(f"Error in sentiment over time: {e}")
+        return pd.DataFrame(columns=['date', 'Sentiment', 'Counts'])
+
+def week_activity_map(selected_user, df, aggs=None):
+    try:
+        return aggregates.weekday_counts(_aggregates_for(df, aggs=aggs), selected_user)
     except Exception as e:
         print(f"Error in weekly activity map: {e}")
         return pd.Series()
 
-def month_activity_map(selected_user, df):
+def month_activity_map(selected_user, df, aggs=None):
     try:
-        if selected_user != 'Overall Users':
-            df = df[df['username'] == selected_user]
-        return df['month'].value_counts()
+        return aggregates.month_counts(_aggregates_for(df, aggs=aggs), selected_user)
     except Exception as e:
         print(f"Error in monthly activity map: {e}")
         return pd.Series()
 
-def activity_heatmap(selected_user, df):
+def activity_heatmap(selected_user, df, aggs=None):
     try:
-        if selected_user != 'Overall Users':
-            df = df[df['username'] == selected_user]
-        return df.groupby(['day', 'period']).size().unstack().fillna(0)
+        return aggregates.day_period_heatmap(_aggregates_for(df, aggs=aggs), selected_user)
     except Exception as e:
         print(f"Error in activity heatmap: {e}")
         return pd.DataFrame()
@@ -278,26 +219,34 @@ def activity_heatmap(selected_user, df):
 # -------------------------------
 # WordCloud
 # -------------------------------
-def create_wordcloud(selected_user, df, platform="generic", stopwords_path='stop_hinglish.txt'):
-    try:
-        with open(stopwords_path, 'r') as f:
-            stop_words = set(f.read().split())
-
-        if selected_user != 'Overall Users':
-            df = df[df['username'] == selected_user]
-
-        if platform == "facebook":
-            exclude_patterns = ['unsent a message', 'edited a message', 'media']
-        elif platform == "telegram":
-            exclude_patterns = ['photo', 'video', 'sticker', 'voice message', 'file', 'animation']
-        else:
-            exclude_patterns = ['<Media omitted>', 'This message was deleted', '<This message was edited>']
+def wordcloud_name(selected_user):
+    return f"wordcloud-{cache.content_hash(str(selected_user).encode('utf-8'))}.png"
 
-        df = df[~df['message'].str.lower().str.contains('|'.join(exclude_patterns), na=False)]
-
-        wc = WordCloud(width=800, height=400, min_font_size=10, background_color='white', stopwords=stop_words)
-        df_wc = wc.generate(' '.join(df['message']))
-        return df_wc.to_image()
+def create_wordcloud(selected_user, df, platform="generic", stopwords_path='stop_hinglish.txt', chat_corpus=None,
+                     chat_key=None):
+    # chat_corpus should cover the whole chat: each user's cloud is a row of its per-user count table.
+    # With chat_key the rendered PNG is kept next to the cached chat and reused.
+    try:
+        from PIL import Image
+        from wordcloud import WordCloud
+
+        name = wordcloud_name(selected_user)
+        cached = cache.load_bytes(chat_key, name) if chat_key else None
+        if cached is not None:
+            return Image.open(io.BytesIO(cached))
+
+        if chat_corpus is None:
+            chat_corpus = corpus.chat_corpus(df, platform=platform)
+
+        frequencies = corpus.term_frequencies(chat_corpus, corpus.load_stopwords(stopwords_path), selected_user)
+        wc = WordCloud(width=800, height=400, min_font_size=10, background_color='white')
+        image = wc.generate_from_frequencies(frequencies.to_dict()).to_image()
+
+        if chat_key:
+            buffer = io.BytesIO()
+            image.save(buffer, format='PNG')
+            cache.store_bytes(chat_key, name, buffer.getvalue())
+        return image
     except Exception as e:
         print(f"Error in word cloud generation: {e}")
         return None
@@ -305,19 +254,15 @@ def create_wordcloud(selected_user, df, platform="generic", stopwords_path='stop
 # -------------------------------
 # Emoji Analysis
 # -------------------------------
-def emoji_helper(selected_user, df):
+def emoji_helper(selected_user, df, aggs=None):
     try:
+        if aggs is not None and 'emoji' in aggs:
+            return aggregates.emoji_table(aggs, selected_user)
+
         if selected_user != 'Overall Users':
             df = df[df['username'] == selected_user]
 
-        all_possible_emojis = set(emoji.EMOJI_DATA.keys())
-        all_emojis = []
-
-        for message in df['message']:
-            all_emojis.extend([ch for ch in str(message) if ch in all_possible_emojis])
-
-        emoji_df = pd.DataFrame(Counter(all_emojis).most_common(), columns=['Emoji', 'Frequency'])
-        return emoji_df
+        return emoji_frequencies(df['message'])
     except Exception as e:
         print(f"Error in emoji analysis: {e}")
         return pd.DataFrame()
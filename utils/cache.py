@@ -0,0 +1,270 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from utils.features import compact_frame
+from utils.urls import default_url_method
+
+# Bump whenever parser output changes, so stale frames are never served
+PARSER_VERSION = "5"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+SEGMENT_PREFIX = "frame-"
+MAX_SEGMENTS = 16
+META_FILE = "meta.json"
+
+# -------------------------------
+# Keys and Locations
+# -------------------------------
+def cache_dir():
+    return os.environ.get("CONVERSIGHT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "conversight"))
+
+def max_cache_bytes():
+    return int(os.environ.get("CONVERSIGHT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+
+def content_hash(content, chunk_size=1 << 20):
+    # Hashes bytes, memoryviews or mmaps in slices, without copying the whole upload
+    digest = hashlib.blake2b(digest_size=16)
+    view = memoryview(content)
+    for start in range(0, len(view), chunk_size):
+        digest.update(view[start:start + chunk_size])
+    return digest.hexdigest()
+
+def key_suffix():
+    # Frames counted with a non-default URL method are cached apart from the default ones
+    method = default_url_method()
+    return f"-v{PARSER_VERSION}" if method == "fast" else f"-urls-{method}-v{PARSER_VERSION}"
+
+def cache_key(digest, platform):
+    return f"{platform.lower()}-{digest}{key_suffix()}"
+
+def entry_path(key):
+    # Each chat gets its own folder: the parsed frame plus any sidecar files
+    return os.path.join(cache_dir(), key)
+
+# -------------------------------
+# Load / Store
+# -------------------------------
+def _segment_files(key):
+    folder = entry_path(key)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(n for n in os.listdir(folder) if n.startswith(SEGMENT_PREFIX) and n.endswith(".feather"))
+
+def replace_file(path, write):
+    # write(tmp_path) into a uniquely named file next to path, then rename it over path. Sessions and
+    # job threads share one pid, so the temp name must be unique per writer, not per process.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _write_feather(df, path):
+    import pyarrow.feather as feather
+
+    replace_file(path, lambda tmp_path: feather.write_feather(df.reset_index(drop=True), tmp_path,
+                                                              compression="uncompressed"))
+
+def _read_feather(path):
+    import pyarrow.feather as feather
+
+    # Uncompressed Feather is memory-mapped, so the Arrow table itself is not read into the heap. to_pandas()
+    # still copies every column into pandas blocks: a warm load costs about the frame's size in memory.
+    return feather.read_table(path, memory_map=True).to_pandas()
+
+def load_frame(key, attempts=2):
+    # A chat is stored as one or more segments (appended exports add a segment each)
+    for attempt in range(attempts):
+        segments = _segment_files(key)
+        if not segments:
+            return None
+        try:
+            folder = entry_path(key)
+            frames = [_read_feather(os.path.join(folder, name)) for name in segments]
+            os.utime(folder)  # mark as recently used for LRU eviction
+            return compact_frame(frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True))
+        except FileNotFoundError:
+            # A concurrent store_frame dropped a stale segment after listing; list again
+            continue
+        except Exception as e:
+            print(f"Error reading parse cache {key}: {e}")
+            return None
+    return None
+
+def store_frame(key, df, max_bytes=None):
+    try:
+        folder = entry_path(key)
+        os.makedirs(folder, exist_ok=True)
+        # The new frame replaces segment 000 in one rename; readers never see the entry empty
+        first = f"{SEGMENT_PREFIX}000.feather"
+        _write_feather(df, os.path.join(folder, first))
+        for name in _segment_files(key):
+            if name != first:
+                os.remove(os.path.join(folder, name))
+        os.utime(folder)
+        evict(max_cache_bytes() if max_bytes is None else max_bytes, keep=key)
+    except Exception as e:
+        print(f"Error writing parse cache {key}: {e}")
+
+def extend_frame(base_key, key, tail_df, max_bytes=None):
+    # Stores base_key's frame plus tail_df under key without rewriting the base: its segments are
+    # hard-linked (copied where links are unsupported) and only the tail is written.
+    try:
+        base_folder, folder = entry_path(base_key), entry_path(key)
+        os.makedirs(folder, exist_ok=True)
+        segments = _segment_files(base_key)
+        if len(segments) >= MAX_SEGMENTS:
+            base_df = load_frame(base_key)
+            store_frame(key, pd.concat([base_df, tail_df], ignore_index=True), max_bytes)
+            return
+        for name in segments:
+            target = os.path.join(folder, name)
+            if not os.path.exists(target):
+                try:
+                    os.link(os.path.join(base_folder, name), target)
+                except OSError:
+                    shutil.copyfile(os.path.join(base_folder, name), target)
+        _write_feather(tail_df, os.path.join(folder, f"{SEGMENT_PREFIX}{len(segments):03d}.feather"))
+        os.utime(folder)
+        evict(max_cache_bytes() if max_bytes is None else max_bytes, keep=key)
+    except Exception as e:
+        print(f"Error extending parse cache {key}: {e}")
+
+# -------------------------------
+# Sidecar Files
+# -------------------------------
+def load_table(key, name):
+    path = os.path.join(entry_path(key), f"{name}.feather")
+    if not os.path.exists(path):
+        return None
+    try:
+        return _read_feather(path)
+    except Exception as e:
+        print(f"Error reading cached table {name} for {key}: {e}")
+        return None
+
+def store_table(key, name, df):
+    try:
+        os.makedirs(entry_path(key), exist_ok=True)
+        _write_feather(df, os.path.join(entry_path(key), f"{name}.feather"))
+    except Exception as e:
+        print(f"Error writing cached table {name} for {key}: {e}")
+
+def _write_bytes(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+def load_bytes(key, name):
+    # Opaque sidecars such as rendered images
+    path = os.path.join(entry_path(key), name)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+def store_bytes(key, name, data):
+    try:
+        os.makedirs(entry_path(key), exist_ok=True)
+        replace_file(os.path.join(entry_path(key), name), lambda tmp_path: _write_bytes(tmp_path, data))
+    except Exception as e:
+        print(f"Error writing cached file {name} for {key}: {e}")
+
+def load_meta(key):
+    path = os.path.join(entry_path(key), META_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def store_meta(key, meta):
+    os.makedirs(entry_path(key), exist_ok=True)
+    data = json.dumps(meta).encode("utf-8")
+    replace_file(os.path.join(entry_path(key), META_FILE), lambda tmp_path: _write_bytes(tmp_path, data))
+
+# -------------------------------
+# Inspection and Eviction
+# -------------------------------
+def list_entries():
+    # [(key, size_bytes, last_used)] with the least recently used first
+    root = cache_dir()
+    if not os.path.isdir(root):
+        return []
+    entries = []
+    for entry in os.scandir(root):
+        if not entry.is_dir():
+            continue
+        # Hard-linked segments are counted in every entry that shares them, so this can overestimate
+        size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+        entries.append((entry.name, size, entry.stat().st_mtime))
+    return sorted(entries, key=lambda e: e[2])
+
+def remove_entry(key):
+    shutil.rmtree(entry_path(key), ignore_errors=True)
+
+def evict(max_bytes, keep=None):
+    # Drops least recently used chats until the cache fits in max_bytes
+    entries = list_entries()
+    total = sum(size for _, size, _ in entries)
+    removed = []
+    for key, size, _ in entries:
+        if total <= max_bytes:
+            break
+        if key == keep:
+            continue
+        remove_entry(key)
+        total -= size
+        removed.append(key)
+    return removed
+
+def purge(older_than_days=None):
+    removed = []
+    cutoff = time.time() - older_than_days * 86400 if older_than_days is not None else None
+    for key, _, last_used in list_entries():
+        if cutoff is None or last_used < cutoff:
+            remove_entry(key)
+            removed.append(key)
+    return removed
+
+# -------------------------------
+# Command Line
+# -------------------------------
+def _format_size(size):
+    for unit in ["B", "KB", "MB"]:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.cache", description="Inspect or purge the parsed-chat cache.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="show cached chats, least recently used first")
+    purge_cmd = commands.add_parser("purge", help="delete cached chats")
+    purge_cmd.add_argument("--older-than", type=float, metavar="DAYS", help="only entries unused for this many days")
+    evict_cmd = commands.add_parser("evict", help="shrink the cache to a size budget")
+    evict_cmd.add_argument("--max-bytes", type=int, default=None, help=f"default {DEFAULT_MAX_BYTES}")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        entries = list_entries()
+        for key, size, last_used in entries:
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(last_used))}  {_format_size(size):>10}  {key}")
+        print(f"{len(entries)} entries, {_format_size(sum(e[1] for e in entries))} in {cache_dir()}")
+    elif args.command == "purge":
+        removed = purge(args.older_than)
+        print(f"Removed {len(removed)} entries")
+    elif args.command == "evict":
+        removed = evict(max_cache_bytes() if args.max_bytes is None else args.max_bytes)
+        print(f"Removed {len(removed)} entries")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from utils.kinds import NON_TEXT, classify_messages, has_kind
+from utils.patterns import trie_pattern
+
+# Terms that survive tokenization but say nothing about a chat
+EXCLUDED_TERMS = ['deleted', 'null', 'omitted', 'message', 'media', 'photo', 'video', 'sticker', 'animation', 'voice message', 'file']
+CORPUS_CACHE_SIZE = 8
+
+# -------------------------------
+# Clean Messages
+# -------------------------------
+def text_only(messages, platform="generic", kinds=None):
+    # Drops media, deleted, edited and system messages; kinds is the parser's 'kind' column when available
+    if kinds is None:
+        kinds = classify_messages(messages, platform)
+    return messages[~has_kind(kinds, NON_TEXT)]
+
+@lru_cache(maxsize=32)
+def username_pattern(usernames):
+    # usernames is a frozenset, so every view of the same group reuses one compiled trie
+    return re.compile(r'\b(?:' + trie_pattern(sorted(name.lower() for name in usernames)) + r')\b')
+
+def scrub_usernames(messages, usernames):
+    # Lowercases and strips participant names in one pass over the whole column instead of one re.sub per row
+    if messages.empty:
+        return messages.str.lower()
+    text = '\0'.join(messages.tolist()).lower()
+    names = frozenset(name for name in usernames if isinstance(name, str) and name)
+    if names:
+        text = username_pattern(names).sub('', text)
+    parts = text.split('\0')
+    if len(parts) != len(messages):
+        # A message contained NUL itself; fall back to row by row
+        pattern = username_pattern(names) if names else None
+        parts = [pattern.sub('', m.lower()) if pattern else m.lower() for m in messages]
+    return pd.Series(parts, index=messages.index, dtype=object)
+
+def clean_messages(messages, platform="generic", usernames=None, kinds=None):
+    messages = text_only(messages.fillna('').astype(str), platform, kinds)
+
+    if usernames is not None:
+        messages = scrub_usernames(messages, usernames)
+    else:
+        messages = messages.str.lower()
+
+    return messages
+
+# -------------------------------
+# Build
+# -------------------------------
+def build_corpus(messages, platform="generic", usernames=None, kinds=None):
+    # Cleans and tokenizes once; TF-IDF, LDA and the word cloud all read the same count matrix
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    documents = clean_messages(messages, platform, usernames, kinds)
+    vectorizer = CountVectorizer(max_df=0.95, min_df=2, stop_words='english')
+    counts = vectorizer.fit_transform(documents)
+    return {
+        'documents': documents,
+        'counts': counts,
+        'terms': vectorizer.get_feature_names_out(),
+        'vectorizer': vectorizer,
+    }
+
+_corpora = OrderedDict()
+# Background jobs (utils.jobs) read and fill the cache from several threads
+_corpora_lock = threading.Lock()
+
+def chat_corpus(df, chat_key=None, user=None, platform="generic", usernames=None):
+    # Corpora are kept for the last few (chat, user, platform) views, so the Recap export and the
+    # NLP page reuse one tokenization; df is the frame already narrowed to user
+    key = (chat_key, user, platform, tuple(usernames) if usernames is not None else None)
+    with _corpora_lock:
+        if chat_key is not None and key in _corpora:
+            _corpora.move_to_end(key)
+            return _corpora[key]
+
+    kinds = df['kind'].to_numpy() if 'kind' in df else None
+    try:
+        corpus = build_corpus(df['message'], platform, usernames, kinds)
+        corpus['authors'] = df['username'].loc[corpus['documents'].index].to_numpy()
+    except Exception as e:
+        # e.g. too few messages for any term to reach min_df
+        print(f"Error building chat corpus: {e}")
+        return None
+    if chat_key is not None:
+        with _corpora_lock:
+            _corpora[key] = corpus
+            while len(_corpora) > CORPUS_CACHE_SIZE:
+                _corpora.popitem(last=False)
+    return corpus
+
+# -------------------------------
+# Views
+# -------------------------------
+def tfidf_scores(corpus):
+    # Same weights TfidfVectorizer gives with the corpus's vectorizer settings
+    from sklearn.feature_extraction.text import TfidfTransformer
+
+    if 'tfidf' not in corpus:
+        corpus['tfidf'] = TfidfTransformer().fit_transform(corpus['counts'])
+    return np.asarray(corpus['tfidf'].sum(axis=0)).ravel()
+
+def top_terms(corpus, n=5, excluded=EXCLUDED_TERMS):
+    scores, terms = tfidf_scores(corpus), corpus['terms']
+    ranked = [(terms[i], scores[i]) for i in np.argsort(scores)[::-1] if terms[i] not in excluded]
+    return ranked[:n]
+
+@lru_cache(maxsize=None)
+def load_stopwords(path='stop_hinglish.txt'):
+    with open(path, 'r') as f:
+        return frozenset(f.read().split())
+
+def user_term_counts(corpus):
+    # users x terms counts, summed from the message matrix with one sparse product
+    from scipy import sparse
+
+    if 'user_counts' not in corpus:
+        codes, users = pd.factorize(corpus['authors'])
+        owner = sparse.csr_matrix((np.ones(len(codes), dtype=np.int64), (codes, np.arange(len(codes)))),
+                                  shape=(len(users), len(codes)))
+        corpus['user_counts'] = (pd.Index(users), (owner @ corpus['counts']).tocsr())
+    return corpus['user_counts']
+
+def term_frequencies(corpus, stopwords=(), user=None):
+    # Term counts for the whole corpus, or for one author when the corpus knows who wrote what
+    if user is None or user == 'Overall Users' or 'authors' not in corpus:
+        totals = np.asarray(corpus['counts'].sum(axis=0)).ravel()
+    else:
+        users, table = user_term_counts(corpus)
+        if user not in users:
+            return pd.Series(dtype='int64')
+        totals = table[users.get_loc(user)].toarray().ravel()
+    frequencies = pd.Series(totals, index=corpus['terms'])
+    frequencies = frequencies[(frequencies > 0) & ~frequencies.index.isin(list(stopwords))]
+    return frequencies.sort_values(ascending=False)
@@ -0,0 +1,95 @@
+import re
+from functools import lru_cache
+
+import emoji
+import numpy as np
+import pandas as pd
+
+from utils.patterns import trie_pattern
+
+KEYCAP_BASES = '#*0123456789'
+
+# -------------------------------
+# Compiled Emoji Matcher
+# -------------------------------
+@lru_cache(maxsize=1)
+def emoji_pattern():
+    # Longest match wins, so ZWJ families, flags and skin-tone variants count as one emoji
+    return re.compile(trie_pattern(emoji.EMOJI_DATA.keys()))
+
+@lru_cache(maxsize=65536)
+def split_run(run):
+    # The same few runs ("😂", "👍🏽", "❤️") repeat across a chat, so each is matched once
+    return tuple(emoji_pattern().findall(run))
+
+# -------------------------------
+# Byte Scan
+# -------------------------------
+# UTF-8 bytes of the two keycap tails, U+FE0F and U+20E3
+KEYCAP_TAIL_BYTES = ((0xEF, 0xB8, 0x8F), (0xE2, 0x83, 0xA3))
+KEYCAP_BASE_BYTES = np.zeros(256, dtype=bool)
+KEYCAP_BASE_BYTES[list(KEYCAP_BASES.encode('ascii'))] = True
+
+def _keycap_starts(data, starts, ends):
+    # Runs opening with a keycap tail right after an ASCII base start one byte earlier
+    last = len(data) - 1
+    tail = np.zeros(len(starts), dtype=bool)
+    for lead in KEYCAP_TAIL_BYTES:
+        tail |= np.logical_and.reduce([data[np.minimum(starts + i, last)] == byte for i, byte in enumerate(lead)])
+    return (starts > 0) & (ends - starts >= 3) & tail & KEYCAP_BASE_BYTES[data[np.maximum(starts - 1, 0)]]
+
+def scan_emojis(messages):
+    # One pass over the column's UTF-8 bytes. Emoji are never ASCII (bar a keycap's base), so every
+    # run of non-ASCII bytes is cut out with NumPy and only the distinct runs go through the trie.
+    # Returns (message of each run, run codes, emoji found in each distinct run).
+    messages = messages.fillna('').astype(str)
+    text = '\x00'.join(messages.tolist())
+    if text.count('\x00') >= len(messages):
+        # NUL separates messages below, so it cannot appear inside one
+        text = '\x00'.join(messages.str.replace('\x00', ' ', regex=False).tolist())
+    encoded = text.encode('utf-8', 'surrogatepass')
+    data = np.frombuffer(encoded, dtype=np.uint8)
+
+    edges = np.diff(np.concatenate(([0], (data >= 0x80).view(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    starts = starts - _keycap_starts(data, starts, ends)
+
+    owners = np.searchsorted(np.flatnonzero(data == 0), starts)
+    runs = [encoded[start:end] for start, end in zip(starts.tolist(), ends.tolist())]
+    codes, uniques = pd.factorize(np.array(runs, dtype=object))
+    found = [split_run(run.decode('utf-8', 'surrogatepass')) for run in uniques]
+    return owners, codes, found
+
+def _frequency_table(codes, found, groups=None):
+    # Occurrences of each distinct run (per group) multiplied out to per-emoji totals, most common first
+    runs = pd.DataFrame({'run': codes} if groups is None else {'run': codes, 'group': groups})
+    table = runs.value_counts(sort=False).rename('Frequency').reset_index()
+    table['Emoji'] = [found[run] for run in table['run']]
+    table = table.explode('Emoji').dropna(subset=['Emoji']).astype({'Emoji': object})
+    keys = ['Emoji'] if groups is None else ['group', 'Emoji']
+    table = table.groupby(keys, sort=False)['Frequency'].sum().reset_index()
+    return table.sort_values('Frequency', ascending=False, kind='stable', ignore_index=True)
+
+# -------------------------------
+# Column-Wide Counts
+# -------------------------------
+def count_emojis(messages):
+    # Emoji per message from a single scan of the whole column
+    if len(messages) == 0:
+        return np.zeros(0, dtype=np.int64)
+    owners, codes, found = scan_emojis(messages)
+    per_run = np.fromiter(map(len, found), dtype=np.int64, count=len(found))
+    return np.bincount(owners, weights=per_run[codes], minlength=len(messages)).astype(np.int64)
+
+def emoji_frequencies(messages):
+    # Frequency table of every emoji in the column, most common first
+    _, codes, found = scan_emojis(messages)
+    return _frequency_table(codes, found)[['Emoji', 'Frequency']]
+
+def emoji_frequencies_by(messages, groups):
+    # The same table per group (e.g. sender) from one scan; groups aligns with messages
+    owners, codes, found = scan_emojis(messages)
+    group_codes, group_names = pd.factorize(np.asarray(groups, dtype=object))
+    table = _frequency_table(codes, found, groups=group_codes[owners])
+    table['group'] = group_names.take(table['group'].to_numpy())
+    return table
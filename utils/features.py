@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pandas as pd
+from utils.emojis import count_emojis
+from utils.kinds import classify_messages
+from utils.urls import count_urls
+
+MONTHS = ["January", "February", "March", "April", "May", "June",
+          "July", "August", "September", "October", "November", "December"]
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+PERIODS = ["Night", "Morning", "Afternoon", "Evening"]
+# Opt-in: keep message text in Arrow buffers instead of one Python object per row
+ARROW_STRINGS = os.environ.get("CONVERSIGHT_ARROW_STRINGS", "") == "1"
+
+# -------------------------------
+# Time Features
+# -------------------------------
+def _categorical_from_codes(codes, categories):
+    # NaN codes (missing dates) become -1, which pandas maps to a missing category
+    codes = codes.fillna(0).astype(np.int16).to_numpy() - 1
+    return pd.Categorical.from_codes(codes, categories=categories, ordered=True)
+
+def _small_ints(values, dtype):
+    # Missing dates leave NaN behind, which only a float column can hold
+    return values.astype(dtype) if not values.isna().any() else values.astype(np.float32)
+
+def add_time_features(df):
+    dates = df['date']
+    df['year'] = _small_ints(dates.dt.year, np.uint16)
+    df['month'] = _categorical_from_codes(dates.dt.month, MONTHS)
+    df['day'] = _categorical_from_codes(dates.dt.dayofweek + 1, DAYS)
+    df['hour'] = _small_ints(dates.dt.hour, np.uint8)
+    df['minute'] = _small_ints(dates.dt.minute, np.uint8)
+    return df
+
+# Every "hh:mm AM/PM" label of a day, in minute order
+TIME_LABELS = [f"{(h + 11) % 12 + 1:02d}:{m:02d} {'AM' if h < 12 else 'PM'}" for h in range(24) for m in range(60)]
+
+def time_labels(dates):
+    # The "hh:mm AM/PM" text of each timestamp, built on demand (exports) instead of stored per row
+    dates = pd.Series(dates)
+    minutes = (dates.dt.hour * 60 + dates.dt.minute).fillna(-1).astype(np.int16).to_numpy()
+    return pd.Series(pd.Categorical.from_codes(minutes, categories=TIME_LABELS), index=dates.index, name='time')
+
+def add_period(df):
+    # Night [0, 6), Morning [6, 12), Afternoon [12, 18), Evening [18, 24)
+    df['period'] = pd.cut(df['hour'], bins=[0, 6, 12, 18, 24], right=False, labels=PERIODS)
+    return df
+
+# -------------------------------
+# Message Features
+# -------------------------------
+def per_unique(messages, func):
+    # Chats repeat short replies ("ok", "<Media omitted>") a lot, so each distinct message is scored once
+    codes, uniques = pd.factorize(messages)
+    values = np.fromiter((func(message) for message in uniques), dtype=np.int64, count=len(uniques))
+    return values[codes]
+
+def count_words(messages):
+    # A plain str.split per row: over object strings, pandas' str.split().str.len() and
+    # str.count(r"\S+") are 3-6x slower (python -m benchmarks.bench_features times both)
+    return np.array([len(x.split()) for x in messages.tolist()], dtype=np.int64)
+
+def add_message_features(df, platform="generic", url_method=None):
+    messages = df['message'].fillna('').astype(str)
+    df['total_word'] = count_words(messages).astype(np.uint32)
+    df['url_count'] = count_urls(messages, url_method).astype(np.uint32)
+    df['emoji_count'] = count_emojis(messages).astype(np.uint32)
+    df['kind'] = classify_messages(messages, platform)
+    return df
+
+# -------------------------------
+# Compact Schema
+# -------------------------------
+def compact_frame(df, arrow_strings=None):
+    # Senders repeat on every row, so they are stored once as categories. Frames concatenated from
+    # parts with different senders fall back to object columns; this restores the categorical.
+    if 'username' in df and not isinstance(df['username'].dtype, pd.CategoricalDtype):
+        df['username'] = df['username'].astype('category')
+    if ARROW_STRINGS if arrow_strings is None else arrow_strings:
+        df['message'] = df['message'].astype('string[pyarrow]')
+    return df
+
+def enrich_messages(df, platform="generic", url_method=None):
+    # Adds the derived columns every parser returns; expects 'date' and 'message'.
+    # url_method="exact" counts links with URLExtract instead of the compiled pattern; parsers leave
+    # it to CONVERSIGHT_URL_METHOD (cli.py --urls), which also keeps their cached frames apart.
+    df = add_time_features(df)
+    df = add_message_features(df, platform, url_method)
+    df = add_period(df)
+    return compact_frame(df)
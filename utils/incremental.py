@@ -0,0 +1,94 @@
+from parser.whatsapp_formats import detect_format, header_bytes_pattern, sample_text
+from parser.whatsapp_parser import preprocess_whatsapp_bytes
+from utils import aggregates, cache
+
+# Bytes at the end of a cached export compared before hashing the whole prefix
+TAIL_PROBE = 4096
+
+# -------------------------------
+# Prefix Detection
+# -------------------------------
+def _probe(view, length):
+    return cache.content_hash(view[max(0, length - TAIL_PROBE):length])
+
+def record_ingest(key, content, agg_tables, whatsapp_format=None):
+    # Remembers how long the export was, so a later export that extends it can be recognised.
+    # WhatsApp exports also keep their timestamp format: an appended tail is too short to tell
+    # day-first from month-first on its own.
+    view = memoryview(content)
+    if whatsapp_format is None and key.startswith("whatsapp-"):
+        whatsapp_format = detect_format(sample_text(view))
+    cache.store_meta(key, {
+        'length': len(view),
+        'digest': cache.content_hash(view),
+        'tail_probe': _probe(view, len(view)),
+        'whatsapp_format': whatsapp_format,
+    })
+    aggregates.store_aggregates(key, agg_tables)
+
+def find_cached_prefix(content, platform="whatsapp"):
+    # Returns (key, length) of the longest cached export that content starts with, or None
+    view = memoryview(content)
+    prefix, suffix = f"{platform.lower()}-", cache.key_suffix()
+    candidates = []
+    for key, _, _ in cache.list_entries():
+        # The default suffix also ends the "-urls-exact" keys; the digest is always 32 hex characters
+        if not (key.startswith(prefix) and key.endswith(suffix) and len(key) == len(prefix) + 32 + len(suffix)):
+            continue
+        meta = cache.load_meta(key)
+        if meta and meta['length'] < len(view):
+            candidates.append((meta['length'], key, meta))
+
+    for length, key, meta in sorted(candidates, reverse=True):
+        if _probe(view, length) == meta['tail_probe'] and cache.content_hash(view[:length]) == meta['digest']:
+            return key, length
+    return None
+
+def _tail_start(view, length, whatsapp_format=None):
+    # Offset of the first appended message; it must start on a message boundary, anything else
+    # (None) means a full re-parse
+    start = length
+    while start < len(view) and view[start] in b"\r\n":
+        start += 1
+    return start if header_bytes_pattern(whatsapp_format).match(view, start) else None
+
+# -------------------------------
+# Incremental Ingestion
+# -------------------------------
+def ingest_appended(content, key, platform="whatsapp"):
+    # Parses only what was appended since a cached export and stores the result under key.
+    # Returns the full frame, or None when no cached export is a prefix of content.
+    match = find_cached_prefix(content, platform)
+    if match is None:
+        return None
+    base_key, length = match
+
+    view = memoryview(content)
+    whatsapp_format = cache.load_meta(base_key).get('whatsapp_format') or detect_format(sample_text(view))
+    start = _tail_start(view, length, whatsapp_format)
+    base_tables = aggregates.load_aggregates(base_key)
+    if start is None or base_tables is None:
+        return None
+
+    # Only the appended bytes are scanned and decoded
+    tail_df = preprocess_whatsapp_bytes(view[start:], whatsapp_format)
+    cache.extend_frame(base_key, key, tail_df)
+    tail_tables = aggregates.build_aggregates(tail_df, "whatsapp")
+    record_ingest(key, content, aggregates.merge_aggregates(base_tables, tail_tables), whatsapp_format)
+    return cache.load_frame(key)
+
+def ingest_whatsapp(content, key):
+    # Full or incremental ingestion of a WhatsApp export; the frame and its aggregates end up cached under key
+    df = cache.load_frame(key)
+    if df is not None:
+        return df
+
+    df = ingest_appended(content, key)
+    if df is not None:
+        return df
+
+    df = preprocess_whatsapp_bytes(content)
+    if not df.empty:
+        cache.store_frame(key, df)
+        record_ingest(key, content, aggregates.build_aggregates(df, "whatsapp"))
+    return df
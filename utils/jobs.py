@@ -0,0 +1,135 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Heavy analyses run here instead of inside a Streamlit rerun. Threads, not processes: results are
+# models and frames the page uses directly, and every session of the app shares this process.
+MAX_WORKERS = int(os.environ.get("CONVERSIGHT_JOB_WORKERS", 2))
+# Finished jobs kept per (chat key, user, analysis), least recently used dropped first once there are
+# more than JOB_CACHE_SIZE of them or their results take more than JOB_CACHE_BYTES. Reports, word
+# clouds and sentiment are also cached on disk, so a dropped result is cheap to get back.
+JOB_CACHE_SIZE = 64
+JOB_CACHE_BYTES = 256 * 1024 ** 2
+# How soon the page looks at a running job again
+POLL_SECONDS = 0.5
+
+_executor = None
+_jobs = OrderedDict()
+# Re-entrant: a done-callback added to an already finished future runs inside submit
+_lock = threading.RLock()
+
+# -------------------------------
+# Submitting
+# -------------------------------
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="conversight-job")
+    return _executor
+
+def result_bytes(value):
+    # Rough in-memory size of a job result: payload bytes, frames, arrays and images, summed through
+    # the dicts and lists analyses return
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(result_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(result_bytes(item) for item in value)
+    if hasattr(value, 'memory_usage'):  # Series or DataFrame
+        return int(np.sum(value.memory_usage(index=True, deep=False)))
+    if hasattr(value, 'nbytes'):  # ndarray
+        return int(value.nbytes)
+    if hasattr(value, 'getbands'):  # PIL image
+        return value.width * value.height * len(value.getbands())
+    return sys.getsizeof(value)
+
+def _failed(future):
+    # Analyses catch their own errors and return None, so None counts as a failure too
+    return future.done() and (future.exception() is not None or future.result() is None)
+
+def _evict():
+    finished = [key for key, job in _jobs.items() if job['future'].done()]
+    count, total = len(_jobs), sum(_jobs[key]['bytes'] for key in finished)
+    for key in finished:
+        if count <= JOB_CACHE_SIZE and total <= JOB_CACHE_BYTES:
+            break
+        total -= _jobs.pop(key)['bytes']
+        count -= 1
+
+def _on_done(future):
+    with _lock:
+        _evict()
+
+def _run(job, fn, args, kwargs):
+    def progress(fraction, message=None, **partial):
+        # Called from inside fn: a fraction in [0, 1], an optional stage message and any results ready so far
+        job['progress'] = min(max(float(fraction), 0.0), 1.0)
+        if message is not None:
+            job['message'] = message
+        job['partial'].update(partial)
+
+    try:
+        value = fn(*args, progress=progress, **kwargs)
+        job['bytes'] = result_bytes(value)
+        return value
+    finally:
+        job['progress'] = 1.0
+        job['finished'] = time.time()
+
+def submit(chat_key, user, analysis, fn, *args, retry_failed=True, **kwargs):
+    # Starts fn(*args, progress=..., **kwargs) unless the same (chat, user, analysis) job is running or done,
+    # and returns its handle. A failed job (an exception or a None result) is started again, unless
+    # retry_failed is False: then its failure is returned as is, e.g. to show it once.
+    key = (chat_key, user, analysis)
+    with _lock:
+        job = _jobs.get(key)
+        if job is not None and not (retry_failed and _failed(job['future'])):
+            _jobs.move_to_end(key)
+            return job
+
+        job = {'key': key, 'progress': 0.0, 'message': "Queued", 'partial': {},
+               'started': time.time(), 'finished': None, 'bytes': 0}
+        job['future'] = _pool().submit(_run, job, fn, args, kwargs)
+        _jobs[key] = job
+        _evict()
+        job['future'].add_done_callback(_on_done)
+        return job
+
+def get(chat_key, user, analysis):
+    return _jobs.get((chat_key, user, analysis))
+
+# -------------------------------
+# Polling
+# -------------------------------
+def status(job):
+    # A snapshot for drawing the job; never blocks
+    future = job['future']
+    error = None
+    if not future.done():
+        state = 'running' if future.running() else 'queued'
+    elif _failed(future):
+        state = 'failed'
+        error = str(future.exception()) if future.exception() is not None else "no result (see the server log)"
+    else:
+        state = 'done'
+    end = job['finished'] or time.time()
+    return {
+        'state': state,
+        'progress': job['progress'],
+        'message': job['message'],
+        'partial': dict(job['partial']),
+        'error': error,
+        'seconds': end - job['started'],
+    }
+
+def result(job, timeout=None):
+    # Blocks until the job is finished; re-raises its exception
+    return job['future'].result(timeout)
@@ -0,0 +1,91 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+
+# Bit flags stored in the 'kind' column; a message can carry several
+MEDIA = 1
+DELETED = 2
+EDITED = 4
+CONTACT = 8
+LOCATION = 16
+SYSTEM = 32
+# Telegram messages mentioning "location" (shared places), which the NLP views have always left out.
+# Kept apart from LOCATION, which counts map links in the stats.
+PLACE = 64
+
+# Readable names of the flags, as written to CSV and Excel exports
+KIND_NAMES = {MEDIA: 'media', DELETED: 'deleted', EDITED: 'edited',
+              CONTACT: 'contact', LOCATION: 'location', SYSTEM: 'system', PLACE: 'place'}
+
+# Messages the NLP views leave out
+NON_TEXT = MEDIA | DELETED | EDITED | SYSTEM | PLACE
+
+PHONE_PATTERN = r'\+?\d{2,4}[\s-]?\d{10}'
+LOCATION_PATTERN = r'//maps\.google\.com/\?q=\d+\.\d+,\d+\.\d+'
+
+KIND_PATTERNS = {
+    "whatsapp": [
+        (MEDIA, [r'<Media omitted>']),
+        (DELETED, [r'This message was deleted', r'You deleted this message']),
+        (EDITED, [r'<This message was edited>']),
+        (SYSTEM, [r'Messages and calls are end-to-end encrypted', r'security code changed']),
+    ],
+    "telegram": [
+        (MEDIA, [r'photo', r'video', r'sticker', r'file', r'voice message', r'animation', r'audio']),
+        (DELETED, [r'This message was deleted']),
+        (SYSTEM, [r'\[Media or system message\]']),
+        (PLACE, [r'location']),
+    ],
+    "facebook": [
+        (MEDIA, [r'image', r'video', r'sticker', r'file', r'attachment']),
+        (DELETED, [r'unsent a message']),
+        (EDITED, [r'edited a message']),
+        (SYSTEM, [r'You are now connected on Messenger', r'named the group', r'changed the group photo']),
+    ],
+}
+
+def _platform_patterns(platform):
+    # "generic" (no platform given) uses WhatsApp's markers; anything else unknown is reported once,
+    # since kind_pattern caches the result per platform
+    platform = platform.lower()
+    if platform not in KIND_PATTERNS and platform != "generic":
+        print(f"Warning: no message kinds defined for platform {platform!r}; using WhatsApp's")
+    patterns = KIND_PATTERNS.get(platform, KIND_PATTERNS["whatsapp"])
+    return patterns + [(CONTACT, [PHONE_PATTERN, r'\.vcf']), (LOCATION, [LOCATION_PATTERN])]
+
+# -------------------------------
+# Fused Classifier
+# -------------------------------
+@lru_cache(maxsize=None)
+def kind_pattern(platform="generic"):
+    # Every kind of every platform in one case-insensitive pattern; the group name carries the flag
+    groups = [f'(?P<k{flag}>{"|".join(patterns)})' for flag, patterns in _platform_patterns(platform)]
+    return re.compile('|'.join(groups), re.IGNORECASE)
+
+def classify_messages(messages, platform="generic"):
+    # One scan over the whole column; messages are joined with NUL, which no pattern can match across
+    messages = messages.fillna('').astype(str)
+    kinds = np.zeros(len(messages), dtype=np.uint8)
+    if messages.empty:
+        return kinds
+
+    text = '\0'.join(messages.tolist())
+    starts, flags = [], []
+    for match in kind_pattern(platform).finditer(text):
+        starts.append(match.start())
+        flags.append(int(match.lastgroup[1:]))
+
+    ends = np.cumsum(messages.str.len().to_numpy() + 1)
+    owners = np.searchsorted(ends, np.asarray(starts, dtype=np.int64), side='right')
+    np.bitwise_or.at(kinds, owners, np.asarray(flags, dtype=np.uint8))
+    return kinds
+
+def has_kind(kinds, flag):
+    return (np.asarray(kinds) & flag) != 0
+
+def kind_labels(kinds):
+    # "media", "deleted, edited", ... per message, "" for plain text; each distinct mask is named once
+    values, inverse = np.unique(np.asarray(kinds, dtype=np.uint8), return_inverse=True)
+    names = [', '.join(name for flag, name in KIND_NAMES.items() if value & flag) for value in values]
+    return np.array(names, dtype=object)[inverse]
@@ -0,0 +1,45 @@
+import re
+
+# -------------------------------
+# Trie-Shaped Regex
+# -------------------------------
+def _trie_to_regex(node):
+    if '' in node and len(node) == 1:
+        return None
+
+    alternatives = []
+    single_chars = []
+    optional = False
+
+    for char in sorted(node):
+        if char == '':
+            optional = True
+            continue
+        sub = _trie_to_regex(node[char])
+        if sub is None:
+            single_chars.append(re.escape(char))
+        else:
+            alternatives.append(re.escape(char) + sub)
+
+    only_chars = not alternatives
+    if single_chars:
+        alternatives.append(single_chars[0] if len(single_chars) == 1 else '[' + ''.join(single_chars) + ']')
+
+    result = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+    if optional:
+        result = result + '?' if only_chars and len(alternatives) == 1 else '(?:' + result + ')?'
+    return result
+
+def trie_pattern(words):
+    # Builds one regex for many literals; shared prefixes are matched once and the longest literal wins
+    trie = {}
+    for word in words:
+        if not word:
+            continue
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+    if not trie:
+        return '(?!)'
+    return _trie_to_regex(trie)
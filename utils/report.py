@@ -0,0 +1,133 @@
+import io
+
+import pandas as pd
+
+from utils import analysis, cache
+from utils.features import time_labels
+from utils.kinds import kind_labels
+
+# Excel's hard limit per sheet, header row included
+EXCEL_MAX_ROWS = 1_048_576
+# Rows converted and written per step; bounds the Python objects alive at once
+CHUNK_ROWS = 50_000
+WORKBOOK_OPTIONS = {
+    # Rows go straight to a temp file per sheet instead of being held until close
+    'constant_memory': True,
+    # Chat text is data: "=..." is not a formula and links should not eat Excel's hyperlink quota
+    'strings_to_formulas': False,
+    'strings_to_urls': False,
+    'default_date_format': 'yyyy-mm-dd hh:mm',
+    'remove_timezone': True,
+}
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# -------------------------------
+# CSV
+# -------------------------------
+def export_frame(df):
+    # Parsed chats no longer store the "hh:mm AM/PM" text; exports get it back next to 'minute'.
+    # The 'kind' bitmask is written as readable flags ("media", "deleted, edited").
+    df = df.copy(deep=False)
+    if 'time' not in df and 'date' in df:
+        position = df.columns.get_loc('minute') + 1 if 'minute' in df else len(df.columns)
+        df.insert(position, 'time', time_labels(df['date']))
+    if 'kind' in df:
+        df['kind'] = kind_labels(df['kind'])
+    return df
+
+def csv_chunks(df, chunk_rows=CHUNK_ROWS):
+    # The frame as CSV text, a slice at a time; the header comes with the first slice
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=start == 0)
+
+def write_csv(df, buffer=None, chunk_rows=CHUNK_ROWS):
+    buffer = buffer if buffer is not None else io.BytesIO()
+    for chunk in csv_chunks(df, chunk_rows):
+        buffer.write(chunk.encode('utf-8'))
+    buffer.seek(0)
+    return buffer
+
+def csv_name(selected_user):
+    return f"export-{cache.content_hash(str(selected_user).encode('utf-8'))}.csv"
+
+def chat_csv(selected_user, df, chat_key=None):
+    # The export as CSV bytes; with chat_key it is built once and kept next to the cached chat
+    cached = cache.load_bytes(chat_key, csv_name(selected_user)) if chat_key else None
+    if cached is not None:
+        return cached
+    try:
+        data = write_csv(export_frame(df)).getvalue()
+        if chat_key:
+            cache.store_bytes(chat_key, csv_name(selected_user), data)
+        return data
+    except Exception as e:
+        print(f"Error building CSV export: {e}")
+        return None
+
+# -------------------------------
+# Excel
+# -------------------------------
+def _cell_rows(table):
+    # Plain Python values per row; NaN/NaT become None, which xlsxwriter leaves blank
+    table = table.astype(object)
+    return table.where(table.notna(), None).itertuples(index=False, name=None)
+
+def write_sheet(workbook, name, table, chunk_rows=CHUNK_ROWS):
+    # constant_memory needs rows in order; tables longer than Excel allows continue on "<name> 2", ...
+    per_sheet = EXCEL_MAX_ROWS - 1
+    header = [str(c) for c in table.columns]
+    for part, start in enumerate(range(0, max(len(table), 1), per_sheet), start=1):
+        worksheet = workbook.add_worksheet(name if part == 1 else f"{name} {part}"[:31])
+        worksheet.write_row(0, 0, header)
+        row = 1
+        stop = min(start + per_sheet, len(table))
+        for chunk_start in range(start, stop, chunk_rows):
+            for values in _cell_rows(table.iloc[chunk_start:min(chunk_start + chunk_rows, stop)]):
+                worksheet.write_row(row, 0, values)
+                row += 1
+
+def write_excel(sheets, buffer=None, chunk_rows=CHUNK_ROWS):
+    # sheets: {sheet name: DataFrame}, written in order into an in-memory workbook
+    import xlsxwriter
+
+    buffer = buffer if buffer is not None else io.BytesIO()
+    workbook = xlsxwriter.Workbook(buffer, WORKBOOK_OPTIONS)
+    try:
+        for name, table in sheets.items():
+            write_sheet(workbook, name, table, chunk_rows)
+    finally:
+        workbook.close()
+    buffer.seek(0)
+    return buffer
+
+# -------------------------------
+# Chat Report
+# -------------------------------
+def report_name(selected_user):
+    return f"report-{cache.content_hash(str(selected_user).encode('utf-8'))}.xlsx"
+
+def report_sheets(selected_user, df, platform="generic", aggs=None, chat_corpus=None, topic_model=None):
+    # The analysis tables behind the full report; pass the corpus and topic model the caller already has
+    tfidf_words = analysis.perform_tfidf_analysis(df['message'], platform, chat_corpus=chat_corpus)
+    lda_topics = analysis.perform_lda_analysis(df['message'], 5, platform, model=topic_model,
+                                               chat_corpus=chat_corpus if selected_user != 'Overall Users' else None)
+    return {
+        "Messages": export_frame(df),
+        "Emoji Summary": analysis.emoji_helper(selected_user, df, aggs=aggs),
+        "TF-IDF": pd.DataFrame(tfidf_words, columns=["Word", "TF-IDF Score"]),
+        "Topics": pd.DataFrame(lda_topics, columns=["LDA Topics"]),
+    }
+
+def load_report(chat_key, selected_user):
+    return cache.load_bytes(chat_key, report_name(selected_user)) if chat_key else None
+
+def chat_report(selected_user, df, platform="generic", aggs=None, chat_corpus=None, topic_model=None, chat_key=None):
+    # Excel report as bytes; with chat_key it is kept next to the cached chat for load_report
+    try:
+        data = write_excel(report_sheets(selected_user, df, platform, aggs, chat_corpus, topic_model)).getvalue()
+        if chat_key:
+            cache.store_bytes(chat_key, report_name(selected_user), data)
+        return data
+    except Exception as e:
+        print(f"Error building report: {e}")
+        return None
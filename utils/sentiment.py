@@ -0,0 +1,213 @@
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from utils import cache
+
+# Polarity is memoised per distinct message text in one small database next to the parse cache
+SENTIMENT_DB = "sentiment.sqlite"
+SENTIMENT_TABLE = "sentiment"
+# Seconds a writer waits for another session's or job's write lock before giving up
+SQLITE_TIMEOUT = 30
+ENGINE = "textblob"
+BATCH_SIZE = 2000
+LABELS = ['negative', 'neutral', 'positive']
+
+# "textblob" scores each distinct message exactly; "lexicon" scores the whole column at once with
+# one sparse matrix product and agrees with TextBlob on most labels (see benchmarks/bench_sentiment.py)
+BACKENDS = ["textblob", "lexicon"]
+HINGLISH_LEXICON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sentiment_hinglish.txt')
+NEGATIONS = ("no", "not", "never")
+
+def default_backend():
+    return os.environ.get("CONVERSIGHT_SENTIMENT_BACKEND", "textblob")
+
+# -------------------------------
+# Polarity
+# -------------------------------
+def polarity_label(polarity):
+    return np.select([polarity > 0, polarity < 0], ['positive', 'negative'], 'neutral')
+
+def _textblob_batch(texts):
+    from textblob import TextBlob
+
+    scores = []
+    for text in texts:
+        try:
+            scores.append(TextBlob(text).sentiment.polarity)
+        except Exception as e:
+            print(f"Error in sentiment analysis: {e}")
+            scores.append(0.0)
+    return scores
+
+def compute_polarity(texts, max_workers=None, batch_size=BATCH_SIZE):
+    # Scores texts in batches; large jobs are spread over a process pool. Workers are spawned, not
+    # forked: this runs on the app's job threads, and a forked child of a multithreaded process can
+    # inherit a lock some other thread held and hang on it.
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if len(batches) <= 1 or max_workers == 1:
+        results = [_textblob_batch(batch) for batch in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(_textblob_batch, batches))
+    return [score for batch in results for score in batch]
+
+# -------------------------------
+# Lexicon Backend
+# -------------------------------
+def _load_hinglish(path):
+    lexicon = {}
+    if not os.path.exists(path):
+        print(f"Warning: Hinglish lexicon {path} not found; scoring with TextBlob's English words only")
+        return lexicon
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 2 and not line.startswith('#'):
+                lexicon[parts[0].lower()] = float(parts[1])
+    return lexicon
+
+@lru_cache(maxsize=None)
+def lexicon_weights(hinglish_path=HINGLISH_LEXICON):
+    # TextBlob's own adjective lexicon (en-sentiment.xml, averaged over senses) plus Hinglish terms
+    from textblob.en import sentiment as english
+
+    english.load()
+    lexicon = {word: senses[None][0] for word, senses in english.items() if ' ' not in word}
+    lexicon.update(_load_hinglish(hinglish_path))
+    return lexicon
+
+def _expand_negations(text):
+    return text.lower().replace("n't", " not")
+
+@lru_cache(maxsize=None)
+def lexicon_vectorizer(hinglish_path=HINGLISH_LEXICON):
+    # Vocabulary is every lexicon word plus "not <word>" bigrams. A negated word keeps its unigram hit,
+    # so its bigram weight of -1.5 x polarity nets out to TextBlob's "not good" = -0.5 x good.
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    lexicon = lexicon_weights(hinglish_path)
+    terms = list(lexicon)
+    weights = [lexicon[w] for w in terms]
+    hits = [1.0] * len(terms)
+    for negation in NEGATIONS:
+        terms += [f"{negation} {w}" for w in lexicon if lexicon[w] != 0]
+        weights += [-1.5 * p for p in lexicon.values() if p != 0]
+        hits += [0.0] * (len(terms) - len(hits))
+
+    vectorizer = CountVectorizer(vocabulary={term: i for i, term in enumerate(terms)}, ngram_range=(1, 2),
+                                 token_pattern=r"(?u)\b\w+\b", preprocessor=_expand_negations)
+    return vectorizer, np.asarray(weights), np.asarray(hits)
+
+def lexicon_polarity(texts):
+    # Mean polarity of the lexicon words in each message: (DTM @ weights) / (DTM @ hits)
+    if len(texts) == 0:
+        return np.zeros(0)
+    vectorizer, weights, hits = lexicon_vectorizer()
+    dtm = vectorizer.transform(texts)
+    total, known = dtm @ weights, dtm @ hits
+    return np.clip(np.divide(total, known, out=np.zeros_like(total), where=known > 0), -1.0, 1.0)
+
+# -------------------------------
+# Persistent Memo
+# -------------------------------
+def _text_digest(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+_connections = threading.local()
+
+def _connect():
+    # One connection per thread and database file: sessions and job threads never share one. WAL lets
+    # readers run while another thread writes, and writers wait up to SQLITE_TIMEOUT for each other.
+    path = os.path.join(cache.cache_dir(), SENTIMENT_DB)
+    opened = _connections.__dict__.setdefault('by_path', {})
+    if path not in opened:
+        os.makedirs(cache.cache_dir(), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=SQLITE_TIMEOUT)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS polarity "
+                     "(engine TEXT, digest BLOB, score REAL, PRIMARY KEY (engine, digest))")
+        opened[path] = conn
+    return opened[path]
+
+def _lookup(conn, engine, digests, chunk_size=900):
+    # SQLite caps bound parameters per statement, so look digests up in chunks
+    known = {}
+    for start in range(0, len(digests), chunk_size):
+        chunk = digests[start:start + chunk_size]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(f"SELECT digest, score FROM polarity WHERE engine = ? AND digest IN ({placeholders})",
+                            [engine, *chunk])
+        known.update(rows)
+    return known
+
+def memoised_polarity(texts, engine=ENGINE, scorer=None, max_workers=None):
+    # Scores distinct texts, computing only those the memo has never seen
+    scorer = scorer or compute_polarity
+    digests = [_text_digest(text) for text in texts]
+    try:
+        conn = _connect()
+        known = _lookup(conn, engine, digests)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error reading sentiment cache: {e}")
+        return scorer(texts, max_workers=max_workers)
+
+    missing = [i for i, digest in enumerate(digests) if digest not in known]
+    if missing:
+        # Scored outside any transaction, so a long batch never holds the write lock
+        scores = scorer([texts[i] for i in missing], max_workers=max_workers)
+        fresh = [(engine, digests[i], score) for i, score in zip(missing, scores)]
+        known.update((digest, score) for _, digest, score in fresh)
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO polarity VALUES (?, ?, ?)", fresh)
+        except sqlite3.Error as e:
+            # e.g. still locked after SQLITE_TIMEOUT; the scores are returned all the same
+            print(f"Error writing sentiment cache: {e}")
+    return [known[digest] for digest in digests]
+
+# -------------------------------
+# Column API
+# -------------------------------
+def polarity_scores(messages, max_workers=None, backend=None):
+    # Identical messages ("ok", "haha", ...) are scored once and broadcast back
+    backend = backend or default_backend()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown sentiment backend {backend!r}; expected one of {BACKENDS}")
+
+    codes, uniques = pd.factorize(messages.fillna('').astype(str))
+    if backend == "lexicon":
+        scores = lexicon_polarity(list(uniques))
+    else:
+        scores = memoised_polarity(list(uniques), max_workers=max_workers)
+    scores = np.asarray(scores, dtype=np.float32)
+    return pd.Series(scores[codes] if len(uniques) else np.zeros(len(codes), dtype=np.float32),
+                     index=messages.index, name='polarity')
+
+def sentiment_labels(polarity):
+    return pd.Series(pd.Categorical(polarity_label(polarity.to_numpy()), categories=LABELS),
+                     index=polarity.index, name='Sentiment')
+
+def chat_sentiment(df, chat_key=None, max_workers=None, backend=None):
+    # Sentiment of every message in a chat, stored beside the parsed frame so reruns and
+    # per-user views only slice it
+    backend = backend or default_backend()
+    table_name = f"{SENTIMENT_TABLE}-{backend}"
+    polarity = None
+    if chat_key:
+        table = cache.load_table(chat_key, table_name)
+        if table is not None and len(table) == len(df):
+            polarity = pd.Series(table['polarity'].to_numpy(), index=df.index, name='polarity')
+
+    if polarity is None:
+        polarity = polarity_scores(df['message'], max_workers, backend)
+        if chat_key:
+            cache.store_table(chat_key, table_name, polarity.to_frame())
+    return sentiment_labels(polarity)
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+STREAK_COLUMNS = ['username', 'active_days', 'longest_streak', 'streak_start', 'streak_end',
+                  'current_streak', 'longest_silence', 'silence_start', 'silence_end']
+
+# -------------------------------
+# Active Days
+# -------------------------------
+def _day_numbers(dates):
+    # Calendar days as integers (days since 1970-01-01); NaT is dropped by the caller
+    return pd.DatetimeIndex(dates).values.astype('datetime64[D]').astype(np.int64)
+
+def _to_dates(days):
+    return pd.to_datetime(np.asarray(days, dtype=np.int64), unit='D')
+
+def _first_per_group(groups, *sort_keys):
+    # Index of the first row of each group after ordering by the given keys (last key sorts first)
+    order = np.lexsort(sort_keys + (groups,))
+    first = np.r_[True, groups[order][1:] != groups[order][:-1]]
+    return order[first]
+
+# -------------------------------
+# Streaks and Silences
+# -------------------------------
+def _streaks(codes, days, n_users, reference_day):
+    # codes/days are one row per (user, active day) pair in any order; every user is handled at once
+    order = np.lexsort((days, codes))
+    codes, days = codes[order], days[order]
+    distinct = np.r_[True, (codes[1:] != codes[:-1]) | (days[1:] != days[:-1])]
+    codes, days = codes[distinct], days[distinct]
+
+    new_user = np.r_[True, codes[1:] != codes[:-1]]
+    gap = np.r_[0, np.diff(days)]
+
+    # Runs of consecutive days
+    run_start = new_user | (gap != 1)
+    run_id = np.cumsum(run_start) - 1
+    run_len = np.bincount(run_id)
+    run_user, run_first = codes[run_start], days[run_start]
+    run_last = run_first + run_len - 1
+
+    longest = _first_per_group(run_user, run_first, -run_len)
+    last_run = np.r_[run_user[1:] != run_user[:-1], True]
+    # A streak is still running if its user was active on the chat's last day or the day before
+    current = np.where(run_last[last_run] >= reference_day - 1, run_len[last_run], 0)
+
+    # Silences: days without a message between two active days of the same user
+    silence = np.where(new_user, 0, gap - 1)
+    widest = _first_per_group(codes, days, -silence)
+
+    table = pd.DataFrame(index=pd.RangeIndex(n_users))
+    table['active_days'] = np.bincount(codes, minlength=n_users)
+    table.loc[run_user[longest], 'longest_streak'] = run_len[longest]
+    table.loc[run_user[longest], 'streak_start'] = _to_dates(run_first[longest])
+    table.loc[run_user[longest], 'streak_end'] = _to_dates(run_last[longest])
+    table.loc[run_user[last_run], 'current_streak'] = current
+    table.loc[codes[widest], 'longest_silence'] = silence[widest]
+    has_silence = silence[widest] > 0
+    table.loc[codes[widest][has_silence], 'silence_start'] = _to_dates(days[widest][has_silence] - silence[widest][has_silence])
+    table.loc[codes[widest][has_silence], 'silence_end'] = _to_dates(days[widest][has_silence] - 1)
+    return table
+
+def streak_table(aggs):
+    # Per-user streak and silence stats plus an 'Overall Users' row, read from the cube's active days
+    cube = aggs['cube'][['username', 'date']].dropna()
+    columns = {c: pd.Series(dtype='int64') for c in STREAK_COLUMNS}
+    if cube.empty:
+        return pd.DataFrame(columns)
+
+    codes, users = pd.factorize(cube['username'])
+    days = _day_numbers(cube['date'])
+    reference_day = days.max()
+
+    per_user = _streaks(codes, days, len(users), reference_day)
+    overall = _streaks(np.zeros(len(days), dtype=np.int64), days, 1, reference_day)
+    table = pd.concat([per_user, overall], ignore_index=True)
+    table.insert(0, 'username', list(users) + ['Overall Users'])
+
+    counts = ['active_days', 'longest_streak', 'current_streak', 'longest_silence']
+    table[counts] = table[counts].fillna(0).astype('int64')
+    for column in ['streak_start', 'streak_end', 'silence_start', 'silence_end']:
+        table[column] = pd.to_datetime(table[column])
+    return table[STREAK_COLUMNS]
+
+def user_streaks(aggs, user=None):
+    # One row of streak_table as a Series; None and 'Overall Users' mean the whole chat
+    table = streak_table(aggs)
+    row = table[table['username'] == (user or 'Overall Users')]
+    return row.iloc[0] if not row.empty else None
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+from utils import cache
+
+# Chart resolutions from finest to coarsest, with the length of one bin
+GRANULARITIES = {
+    'hour': pd.Timedelta(hours=1),
+    'day': pd.Timedelta(days=1),
+    'week': pd.Timedelta(weeks=1),
+    'month': pd.Timedelta(days=30.44),
+}
+# Points per line a browser chart stays responsive with
+DEFAULT_MAX_POINTS = 500
+
+# -------------------------------
+# Binning
+# -------------------------------
+def pick_granularity(start, end, max_points=DEFAULT_MAX_POINTS):
+    # Finest resolution whose number of bins over [start, end] fits the point budget
+    span = pd.Timestamp(end) - pd.Timestamp(start)
+    for name, step in GRANULARITIES.items():
+        if span / step + 1 <= max_points:
+            return name
+    return 'month'
+
+def bin_dates(dates, granularity):
+    dates = pd.to_datetime(pd.Series(dates))
+    if granularity == 'hour':
+        return dates.dt.floor('H')
+    if granularity == 'day':
+        return dates.dt.normalize()
+    if granularity == 'week':
+        # Weeks start on Monday, like the weekday view
+        return dates.dt.normalize() - pd.to_timedelta(dates.dt.dayofweek, unit='D')
+    if granularity == 'month':
+        return dates.dt.to_period('M').dt.to_timestamp()
+    raise ValueError(f"Unknown granularity {granularity!r}; expected one of {list(GRANULARITIES)}")
+
+FREQUENCIES = {'hour': 'H', 'day': 'D', 'week': 'W-MON', 'month': 'MS'}
+
+def _full_range(first, last, granularity):
+    # Every bin between the first and last one, so quiet periods plot as zero instead of being skipped
+    return pd.date_range(first, last, freq=FREQUENCIES[granularity], name='date')
+
+def bin_counts(dates, labels, max_points=DEFAULT_MAX_POINTS, granularity=None):
+    # Wide table of message counts: one row per time bin, one column per label (user, sentiment, ...)
+    dates = pd.to_datetime(pd.Series(dates)).reset_index(drop=True)
+    labels = pd.Series(labels).reset_index(drop=True)
+    valid = dates.notna()
+    dates, labels = dates[valid], labels[valid]
+    if dates.empty:
+        return pd.DataFrame()
+    granularity = granularity or pick_granularity(dates.min(), dates.max(), max_points)
+    bins = bin_dates(dates, granularity).rename('date')
+    counts = labels.groupby([bins, labels], observed=True).size().unstack(fill_value=0)
+    return counts.reindex(_full_range(counts.index.min(), counts.index.max(), granularity), fill_value=0)
+
+# -------------------------------
+# Multi-Resolution Rollups
+# -------------------------------
+def build_rollups(aggs):
+    # Messages per user at every resolution, rolled up from the hourly cells of the chat cube
+    cube = aggs['cube'].dropna(subset=['date'])
+    stamps = cube['date'] + pd.to_timedelta(cube['hour'].astype('float64'), unit='h')
+    rollups = {}
+    for granularity in GRANULARITIES:
+        frame = pd.DataFrame({'date': bin_dates(stamps, granularity).to_numpy(),
+                              'username': cube['username'].to_numpy(),
+                              'messages': cube['messages'].to_numpy()})
+        rollups[granularity] = frame.groupby(['date', 'username'], sort=True).sum().reset_index()
+    return rollups
+
+def chat_rollups(aggs, chat_key=None):
+    # Stored next to the cached chat; the cube is the source of truth, so they are rebuilt when missing
+    if chat_key:
+        tables = {g: cache.load_table(chat_key, f'rollup-{g}') for g in GRANULARITIES}
+        if all(table is not None for table in tables.values()):
+            return tables
+    rollups = build_rollups(aggs)
+    if chat_key:
+        for granularity, table in rollups.items():
+            cache.store_table(chat_key, f'rollup-{granularity}', table)
+    return rollups
+
+def activity_series(rollups, user=None, start=None, end=None, max_points=DEFAULT_MAX_POINTS):
+    # Messages over time per user for the visible range, at the finest resolution the budget allows
+    days = rollups['day']
+    if user is not None and user != 'Overall Users':
+        days = days[days['username'] == user]
+    if days.empty:
+        return pd.DataFrame()
+
+    start = pd.Timestamp(start) if start is not None else days['date'].min()
+    end = pd.Timestamp(end) if end is not None else days['date'].max() + pd.Timedelta(days=1) - pd.Timedelta(hours=1)
+    granularity = pick_granularity(start, end, max_points)
+
+    first, last = bin_dates([start, end], granularity)
+    table = rollups[granularity]
+    mask = (table['date'] >= first) & (table['date'] <= last)
+    if user is not None and user != 'Overall Users':
+        mask &= table['username'] == user
+    series = table[mask].pivot_table(index='date', columns='username', values='messages',
+                                     aggfunc='sum', fill_value=0, observed=True)
+    if user is not None and user != 'Overall Users':
+        series = series.reindex(columns=[user], fill_value=0)
+    series = series.reindex(_full_range(first, last, granularity), fill_value=0)
+    series.columns.name = 'username'
+    return series.astype(np.int64)
@@ -0,0 +1,163 @@
+import os
+import time
+
+import numpy as np
+
+from utils import cache
+
+# Online LDA settings: minibatches over the message matrix, a perplexity check every few passes,
+# and an early stop once perplexity improves by less than PERP_TOL (relative) between checks
+LEARNING_METHOD = "online"
+BATCH_SIZE = 4096
+MAX_ITER = 10
+EVALUATE_EVERY = 2
+PERP_TOL = 0.01
+# Below this many messages a worker pool costs more than it saves
+PARALLEL_MIN_DOCS = 50_000
+
+# -------------------------------
+# Fit
+# -------------------------------
+def _status_mb(field):
+    # VmRSS / VmHWM (peak) from /proc/self/status, in MB; None off Linux
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def reset_peak_memory():
+    # Restarts the process's peak RSS at its current RSS and returns that, in MB (None where Linux
+    # does not allow it). tracemalloc would slow the fit down by an order of magnitude.
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return None
+    return _status_mb("VmRSS")
+
+def fit_memory_mb(baseline):
+    # How far resident memory peaked above baseline since reset_peak_memory(); a server's other
+    # sessions and threads count too, and the worker processes of n_jobs fits do not
+    peak = _status_mb("VmHWM") if baseline is not None else None
+    return None if peak is None else round(max(peak - baseline, 0.0), 1)
+
+def _fit_online(lda, counts, max_iter=MAX_ITER, evaluate_every=EVALUATE_EVERY, tol=PERP_TOL):
+    # sklearn's perp_tol is an absolute change, so whether it ever fires depends on the vocabulary;
+    # passes are driven here instead (one partial_fit is one fit pass over the minibatches)
+    previous = perplexity = None
+    for iteration in range(1, max_iter + 1):
+        lda.partial_fit(counts)
+        if iteration % evaluate_every == 0 or iteration == max_iter:
+            perplexity = lda.perplexity(counts)
+            if previous is not None and abs(previous - perplexity) / previous < tol:
+                break
+            previous = perplexity
+    return iteration, perplexity
+
+def fit_topics(counts, num_topics=5, learning_method=LEARNING_METHOD, n_jobs=None):
+    # Returns the fitted model and how the fit went: seconds, passes, perplexity and memory used
+    from sklearn.decomposition import LatentDirichletAllocation
+
+    if n_jobs is None and learning_method == "online" and counts.shape[0] >= PARALLEL_MIN_DOCS:
+        n_jobs = -1
+    lda = LatentDirichletAllocation(n_components=num_topics, learning_method=learning_method,
+                                    batch_size=BATCH_SIZE, max_iter=MAX_ITER, n_jobs=n_jobs,
+                                    total_samples=counts.shape[0], random_state=0)
+
+    baseline = reset_peak_memory()
+    start = time.perf_counter()
+    if learning_method == "online":
+        iterations, perplexity = _fit_online(lda, counts)
+    else:
+        lda.fit(counts)
+        iterations, perplexity = lda.n_iter_, lda.bound_
+    fit_seconds = time.perf_counter() - start
+
+    stats = {
+        'fit_seconds': round(fit_seconds, 3),
+        'iterations': int(iterations),
+        'perplexity': float(perplexity),
+        'fit_memory_mb': fit_memory_mb(baseline),
+        'documents': int(counts.shape[0]),
+        'learning_method': learning_method,
+    }
+    return lda, stats
+
+def build_topic_model(chat_corpus, num_topics=5, learning_method=LEARNING_METHOD, n_jobs=None):
+    lda, stats = fit_topics(chat_corpus['counts'], num_topics, learning_method, n_jobs)
+    return {'lda': lda, 'vectorizer': chat_corpus['vectorizer'], 'terms': chat_corpus['terms'], 'stats': stats}
+
+# -------------------------------
+# Persisted Models
+# -------------------------------
+def model_path(chat_key, num_topics=5):
+    return os.path.join(cache.entry_path(chat_key), f"lda-{num_topics}.joblib")
+
+def load_topic_model(chat_key, num_topics=5):
+    import joblib
+
+    path = model_path(chat_key, num_topics)
+    if not os.path.exists(path):
+        return None
+    try:
+        return joblib.load(path)
+    except Exception as e:
+        print(f"Error reading topic model for {chat_key}: {e}")
+        return None
+
+def store_topic_model(chat_key, model):
+    import joblib
+
+    try:
+        path = model_path(chat_key, model['lda'].n_components)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        cache.replace_file(path, lambda tmp_path: joblib.dump(model, tmp_path))
+    except Exception as e:
+        print(f"Error writing topic model for {chat_key}: {e}")
+
+def chat_topic_model(chat_key, chat_corpus, num_topics=5):
+    # Fitted once per chat on every user's messages; per-user views only call transform
+    model = load_topic_model(chat_key, num_topics) if chat_key else None
+    if model is None:
+        model = build_topic_model(chat_corpus, num_topics)
+        if chat_key:
+            store_topic_model(chat_key, model)
+    return model
+
+# -------------------------------
+# Views
+# -------------------------------
+def topic_words(model, top_n=5, excluded=()):
+    terms = model['terms']
+    topics = []
+    for topic in model['lda'].components_:
+        words = [terms[j] for j in topic.argsort()[-top_n:][::-1] if terms[j] not in excluded]
+        topics.append(words)
+    return topics
+
+def topic_shares(model, documents):
+    # Average topic mix of the given messages under the chat's model
+    if len(documents) == 0:
+        return np.zeros(model['lda'].n_components)
+    mix = model['lda'].transform(model['vectorizer'].transform(documents))
+    return mix.mean(axis=0)
+
+def describe_topics(model, documents=None, top_n=5, excluded=()):
+    # "Topic i: a | b | c" lines; with documents (one user's messages) topics are ranked by their share
+    words = topic_words(model, top_n, excluded)
+    if documents is None:
+        return [f"Topic {i + 1}: {' | '.join(w)}" for i, w in enumerate(words)]
+    shares = topic_shares(model, documents)
+    return [f"Topic {i + 1} ({shares[i]:.0%}): {' | '.join(words[i])}" for i in np.argsort(shares)[::-1]]
+
+def format_stats(stats):
+    summary = (f"{stats['learning_method']} LDA on {stats['documents']:,} messages: {stats['fit_seconds']:.1f}s, "
+               f"{stats['iterations']} passes, perplexity {stats['perplexity']:.1f}")
+    # Models cached before fit_memory_mb have no such stat
+    if stats.get('fit_memory_mb') is not None:
+        summary += f", +{stats['fit_memory_mb']:.0f} MB at peak"
+    return summary
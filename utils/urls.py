@@ -0,0 +1,66 @@
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from utils.patterns import trie_pattern
+
+URL_METHODS = ("fast", "exact")
+# IANA's top-level domain list, the same file URLExtract ships with; found next to the package, not the CWD
+TLD_LIST = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tlds-alpha-by-domain.txt')
+
+def default_url_method():
+    return os.environ.get("CONVERSIGHT_URL_METHOD", "fast")
+
+def load_tlds(path=TLD_LIST):
+    with open(path, 'r', encoding='utf-8') as f:
+        tlds = {line.strip().lower() for line in f if line.strip() and not line.startswith('#')}
+    # Internationalized TLDs are listed in punycode; messages spell them out ("xn--p1ai" is "рф")
+    return tlds | {tld.encode('ascii').decode('idna') for tld in tlds if tld.startswith('xn--')}
+
+# -------------------------------
+# Compiled URL Pattern
+# -------------------------------
+@lru_cache(maxsize=1)
+def url_pattern():
+    # Built once per process from the bundled TLD list
+    tld = trie_pattern(sorted(load_tlds()))
+    label = r'[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?'
+    return re.compile(
+        r'(?:https?|ftp)://[^\s<>"]+'
+        r'|(?<![\w@.-])www\d{0,3}\.[^\s<>"]+'
+        r'|(?<![\w@.-])(?:' + label + r'\.)+(?:' + tld + r')(?![\w-])(?::\d{1,5})?(?:[/?#][^\s<>"]*)?',
+        re.IGNORECASE,
+    )
+
+# -------------------------------
+# URL Counting
+# -------------------------------
+def count_urls_fast(messages):
+    # One regex pass over the whole column joined by newlines; URLs never contain whitespace
+    messages = messages.fillna('').astype(str)
+    if messages.empty:
+        return np.zeros(0, dtype=np.int64)
+
+    text = '\n'.join(messages.tolist())
+    starts = np.fromiter((m.start() for m in url_pattern().finditer(text)), dtype=np.int64)
+    ends = np.cumsum(messages.str.len().to_numpy() + 1)
+    owners = np.searchsorted(ends, starts, side='right')
+    return np.bincount(owners, minlength=len(messages)).astype(np.int64)
+
+def count_urls_exact(messages):
+    from urlextract import URLExtract
+
+    from utils.features import per_unique
+
+    extractor = URLExtract()
+    return per_unique(messages.fillna('').astype(str), lambda x: len(extractor.find_urls(x)))
+
+def count_urls(messages, method=None):
+    method = method or default_url_method()
+    if method == "fast":
+        return count_urls_fast(messages)
+    if method == "exact":
+        return count_urls_exact(messages)
+    raise ValueError(f"Unknown URL method {method!r}; expected one of {URL_METHODS}")